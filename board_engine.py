@@ -0,0 +1,238 @@
+import random
+import time
+import numpy as np
+
+WIN_SCORE = 1000000
+EXACT, LOWER, UPPER = 0, 1, 2  # Transposition table bound types
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Function to get the start bits of every run of at least k set bits along a shift direction
+def runs(bits, shift, k):
+    length = 1
+    while length * 2 <= k:
+        bits &= bits >> (shift * length)
+        length *= 2
+    if length < k:
+        bits &= bits >> (shift * (k - length))
+    return bits
+
+
+# An m x n board with k-in-a-row wins for two players (1 and 2), e.g. 3x3/3 Tic-Tac-Toe,
+# 6x7/4 Connect-Four with gravity or 15x15/5 Gomoku.
+# Each player's stones are a bitboard with one spare bit per column, so the line shifts never wrap:
+# cell (row, col) is bit col * (rows + 1) + row.
+class BoardGame:
+    def __init__(self, rows=3, cols=3, k=3, gravity=False, seed=2024):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.gravity = gravity
+        self.height = rows + 1
+        self.shifts = (1, self.height, self.height - 1, self.height + 1)  # Vertical, horizontal and both diagonals
+        self.cells_mask = sum(1 << (c * self.height + r) for c in range(cols) for r in range(rows))
+        rng = random.Random(seed)
+        self._zobrist = [[rng.getrandbits(64) for _ in range(cols * self.height)] for _ in range(2)]
+        self.reset()
+
+    def reset(self):
+        self.bitboards = [0, 0]
+        self.moves = []
+        self.hash = 0
+        self.board = np.zeros((self.rows, self.cols), dtype=int)
+
+    @property
+    def to_move(self):
+        return 1 + len(self.moves) % 2
+
+    def bit(self, cell):
+        return cell[1] * self.height + cell[0]
+
+    def is_empty(self, cell):
+        return self.board[cell] == 0
+
+    # Returns the cell a move aimed at (row, col) lands on, or None if it is not playable
+    def target_cell(self, row, col):
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        if self.gravity:
+            free = np.flatnonzero(self.board[:, col] == 0)
+            return (int(free[-1]), col) if len(free) else None
+        return (row, col) if self.board[row, col] == 0 else None
+
+    def legal_moves(self):
+        if self.gravity:
+            return [cell for cell in (self.target_cell(0, c) for c in range(self.cols)) if cell is not None]
+        return [tuple(cell) for cell in np.argwhere(self.board == 0).tolist()]
+
+    def play(self, cell):
+        player = self.to_move
+        bit = self.bit(cell)
+        self.bitboards[player - 1] |= 1 << bit
+        self.hash ^= self._zobrist[player - 1][bit]
+        self.board[cell] = player
+        self.moves.append(cell)
+
+    def undo(self):
+        cell = self.moves.pop()
+        player = self.to_move
+        bit = self.bit(cell)
+        self.bitboards[player - 1] &= ~(1 << bit)
+        self.hash ^= self._zobrist[player - 1][bit]
+        self.board[cell] = 0
+
+    def has_won(self, player):
+        bits = self.bitboards[player - 1]
+        return any(runs(bits, shift, self.k) for shift in self.shifts)
+
+    # Returns 1 or 2 for a winner, -1 for a draw and None while the game is still going
+    def winner(self):
+        if self.moves:
+            last = 2 - len(self.moves) % 2  # Only the player who just moved can have completed a line
+            if self.has_won(last):
+                return last
+        if len(self.moves) == self.rows * self.cols:
+            return -1
+        return None
+
+    # Heuristic score for the side to move: lines that can still be completed, weighted by
+    # how many stones are already in them
+    def evaluate(self):
+        me, opp = self.to_move - 1, 2 - self.to_move
+        empty = ~(self.bitboards[0] | self.bitboards[1]) & self.cells_mask
+        score = 0
+        for sign, own in ((1, self.bitboards[me]), (-1, self.bitboards[opp])):
+            for shift in self.shifts:
+                open_lines = runs(own | empty, shift, self.k)
+                if not open_lines:
+                    continue
+                for length in range(2, self.k):
+                    # A run of stones starting at either end of an open line
+                    lines = open_lines | (open_lines << (shift * (self.k - length)))
+                    score += sign * (4 ** length) * (runs(own, shift, length) & lines).bit_count()
+        return score
+
+    # Candidate moves, most promising first: the hinted move, then (on open boards) only cells
+    # next to existing stones, closest to the centre first
+    def ordered_moves(self, hint=None):
+        moves = self.legal_moves()
+        if not self.gravity and self.moves and len(moves) > 16:
+            occupied = self.board != 0
+            near = occupied.copy()
+            near[1:] |= occupied[:-1]
+            near[:-1] |= occupied[1:]
+            near[:, 1:] |= near[:, :-1].copy()
+            near[:, :-1] |= near[:, 1:].copy()
+            moves = [cell for cell in moves if near[cell]]
+        center_r, center_c = (self.rows - 1) / 2, (self.cols - 1) / 2
+        moves.sort(key=lambda cell: abs(cell[0] - center_r) + abs(cell[1] - center_c))
+        if hint in moves:
+            moves.remove(hint)
+            moves.insert(0, hint)
+        return moves
+
+    def search(self, max_think_ms=2000, max_depth=None):
+        return MoveSearch(self, max_think_ms, max_depth)
+
+
+# Iterative-deepening alpha-beta search that can be spread over several video frames.
+# Each call to step() searches for at most budget_ms; the best move of the deepest completed
+# iteration is kept in best_move and the transposition table carries work between calls.
+class MoveSearch:
+    def __init__(self, game, max_think_ms=2000, max_depth=None):
+        self.game = game
+        self.max_think_ms = max_think_ms
+        self.max_depth = max_depth or game.rows * game.cols - len(game.moves)
+        self.table = {}
+        self.depth = 0
+        self.thought_ms = 0.0
+        self.done = False
+        moves = game.ordered_moves()
+        self.best_move = moves[0] if moves else None
+        self.best_score = None
+        self._deadline = None
+
+    # Returns True once the search is finished and best_move should be played
+    def step(self, budget_ms):
+        if self.done:
+            return True
+        start = time.perf_counter()
+        budget_ms = min(budget_ms, self.max_think_ms - self.thought_ms)
+        self._deadline = start + budget_ms / 1000
+        try:
+            while self.depth < self.max_depth:
+                move, score = self._root(self.depth + 1)
+                self.depth += 1
+                self.best_move, self.best_score = move, score
+                if abs(score) >= WIN_SCORE - self.max_depth:
+                    break  # A forced result was found, deeper search cannot change it
+            self.done = True
+        except SearchTimeout:
+            pass
+        self.thought_ms += (time.perf_counter() - start) * 1000
+        if self.thought_ms >= self.max_think_ms:
+            self.done = True
+        return self.done
+
+    def _root(self, depth):
+        game = self.game
+        best_move, alpha = None, -WIN_SCORE - 1
+        for move in game.ordered_moves(self.best_move):
+            game.play(move)
+            try:
+                score = -self._negamax(depth - 1, -WIN_SCORE - 1, -alpha, 1)
+            finally:
+                game.undo()
+            if score > alpha:
+                best_move, alpha = move, score
+        return best_move, alpha
+
+    def _negamax(self, depth, alpha, beta, ply):
+        if time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        game = self.game
+        winner = game.winner()
+        if winner is not None:
+            return 0 if winner == -1 else -(WIN_SCORE - ply)  # The previous player just won
+        if depth == 0:
+            return game.evaluate()
+
+        entry = self.table.get(game.hash)
+        hint = None
+        if entry is not None:
+            entry_depth, value, bound, hint = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                elif bound == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        original_alpha = alpha
+        best_value, best_move = -WIN_SCORE - 1, None
+        for move in game.ordered_moves(hint):
+            game.play(move)
+            try:
+                value = -self._negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.undo()
+            if value > best_value:
+                best_value, best_move = value, move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            bound = UPPER
+        elif best_value >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[game.hash] = (depth, best_value, bound, best_move)
+        return best_value
@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+GRID_COLOR = (255, 255, 255)
+GLYPHS = {1: ('X', (255, 0, 0)), 2: ('O', (0, 255, 0))}  # Player -> (mark, BGR colour)
+
+
+# Renders a board of marks over camera frames. The grid and the X/O glyphs are rasterised once into
+# premultiplied sprites with coverage alphas. When the board changes they are composited into a uint8
+# overlay; each frame then gets the fully covered pixels with one masked copy per grid line and mark,
+# and only the antialiased edge pixels are alpha-blended, like drawing on the frame directly would.
+class BoardRenderer:
+    def __init__(self, rows=3, cols=3, width=900, height=900):
+        self.rows = rows
+        self.cols = cols
+        self.width = width
+        self.height = height
+        self.cell_w = width // cols
+        self.cell_h = height // rows
+        self._grid, self._grid_mask = self._render_grid()
+        self._grid_regions = self._line_regions()
+        self._glyphs = {player: self._render_glyph(mark, color) for player, (mark, color) in GLYPHS.items()}
+        self._board_key = None
+        self._regions = None
+        self._edges = None
+        self._edge_colors = None
+        self._edge_alphas = None
+
+    # Slices around each grid line, so copying it skips the empty cells
+    def _line_regions(self):
+        reach = max(1, min(self.cell_w, self.cell_h) // 50) + 1
+        regions = [(slice(0, self.height), slice(max(0, i * self.cell_w - reach), i * self.cell_w + reach + 1))
+                   for i in range(1, self.cols)]
+        regions += [(slice(max(0, i * self.cell_h - reach), i * self.cell_h + reach + 1), slice(0, self.width))
+                    for i in range(1, self.rows)]
+        return regions
+
+    def _render_grid(self):
+        grid = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        mask = np.zeros((self.height, self.width), dtype=np.uint8)
+        line = max(1, min(self.cell_w, self.cell_h) // 50)
+        for target, color in ((grid, GRID_COLOR), (mask, 255)):
+            for i in range(1, self.cols):
+                cv2.line(target, (i * self.cell_w, 0), (i * self.cell_w, self.height), color, line)
+            for i in range(1, self.rows):
+                cv2.line(target, (0, i * self.cell_h), (self.width, i * self.cell_h), color, line)
+        return grid.astype(np.float32), mask.astype(np.float32) / 255
+
+    # Glyph size and placement scale with the cell, matching the original 300px cell layout
+    def _render_glyph(self, mark, color):
+        cell = min(self.cell_w, self.cell_h)
+        scale = 6 * cell / 300
+        thickness = max(1, int(15 * cell / 300))
+        origin = (int(0.3 * self.cell_w), int(0.7 * self.cell_h))
+        sprite = np.zeros((self.cell_h, self.cell_w, 3), dtype=np.uint8)
+        mask = np.zeros((self.cell_h, self.cell_w), dtype=np.uint8)
+        cv2.putText(sprite, mark, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+        cv2.putText(mask, mark, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness)
+        ys, xs = np.nonzero(mask)
+        bounds = (slice(ys.min(), ys.max() + 1), slice(xs.min(), xs.max() + 1))
+        return sprite.astype(np.float32), mask.astype(np.float32) / 255, bounds
+
+    # Rebuilds the overlay when the board has changed. Marks go over the grid with the usual "over"
+    # operator; the result is split into fully covered pixels, copied as they are, and edge pixels
+    # with their premultiplied colours and the weight left to the frame behind them.
+    def overlay(self, board):
+        key = board.tobytes()
+        if key != self._board_key:
+            overlay = self._grid.copy()
+            alpha = self._grid_mask.copy()
+            regions = list(self._grid_regions)
+            for (i, j), player in np.ndenumerate(board):
+                if player in self._glyphs:
+                    sprite, sprite_alpha, (rows, cols) = self._glyphs[player]
+                    cell = (slice(i * self.cell_h, (i + 1) * self.cell_h), slice(j * self.cell_w, (j + 1) * self.cell_w))
+                    overlay[cell] = overlay[cell] * (1 - sprite_alpha[:, :, None]) + sprite
+                    alpha[cell] = alpha[cell] * (1 - sprite_alpha) + sprite_alpha
+                    regions.append((slice(cell[0].start + rows.start, cell[0].start + rows.stop),
+                                    slice(cell[1].start + cols.start, cell[1].start + cols.stop)))
+            solid = alpha >= 1
+            colors = np.clip(overlay + 0.5, 0, 255).astype(np.uint8)
+            self._regions = [(region, colors[region], solid[region].astype(np.uint8)) for region in regions]
+            self._edges = np.nonzero((alpha > 0) & ~solid)
+            self._edge_colors = overlay[self._edges]
+            self._edge_alphas = 1 - alpha[self._edges][:, None]
+            self._board_key = key
+
+    def draw(self, img, board):
+        self.overlay(board)
+        for region, colors, solid in self._regions:
+            cv2.copyTo(colors, solid, img[region])  # Writes straight into the frame view, unlike a masked np.copyto
+        edges = self._edges
+        img[edges] = (img[edges] * self._edge_alphas + self._edge_colors + 0.5).astype(np.uint8)
@@ -0,0 +1,313 @@
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+import cv2
+import numpy as np
+from gesture_classifier import synthetic_hand
+from hand_tracking import draw_hands, stack_landmarks
+
+CAMERA_FORMATS = ("MJPG", "YUYV")  # Preferred pixel formats: MJPG reaches HD frame rates over USB 2, YUYV needs no decoding
+BUFFER_SIZE = 1  # Driver-side frame queue; anything deeper only adds latency
+MAX_PLAUSIBLE_AGE = 2.0  # Seconds; older driver timestamps are treated as being on another clock
+
+# A captured image, the monotonic time it was captured and, for recorded or synthetic sources,
+# the (H, 21, 3) hand landmarks that go with it (in camera coordinates, before any mirroring)
+Frame = namedtuple("Frame", ["image", "timestamp", "landmarks"])
+
+
+# Function to turn a CAP_PROP_FOURCC value into its four-letter code
+def fourcc_string(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4))
+
+
+# Common interface of all sources. read() behaves like cv2.VideoCapture.read() so the scripts can use
+# any source; read_frame() also gives the capture time and landmarks. The ages of recent frames
+# (capture to delivery) are kept in a ring buffer for latency statistics.
+class FrameSource:
+    def __init__(self, width, height, fps):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.format = None
+        self.frames = 0
+        self._ages = np.full(512, np.nan)
+
+    def _grab(self):
+        raise NotImplementedError
+
+    def read_frame(self):
+        frame = self._grab()
+        if frame is not None:
+            self._ages[self.frames % len(self._ages)] = time.monotonic() - frame.timestamp
+            self.frames += 1
+        return frame
+
+    def read(self):
+        frame = self.read_frame()
+        return (False, None) if frame is None else (True, frame.image)
+
+    def isOpened(self):
+        return True
+
+    # Returns the median and 95th percentile frame age in milliseconds
+    def age_stats(self):
+        ages = self._ages[~np.isnan(self._ages)]
+        if len(ages) == 0:
+            return None, None
+        return float(np.median(ages) * 1000), float(np.percentile(ages, 95) * 1000)
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# A webcam. The pixel format, resolution and frame rate are negotiated in order of preference and read
+# back, the driver queue is cut to BUFFER_SIZE, and frame ages come from the driver's capture timestamps.
+class CameraSource(FrameSource):
+    def __init__(self, index=0, width=1280, height=720, fps=30, formats=CAMERA_FORMATS, buffer_size=BUFFER_SIZE):
+        backend = cv2.CAP_V4L2 if sys.platform.startswith("linux") else cv2.CAP_ANY
+        self.cap = cv2.VideoCapture(index, backend)
+        if not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(index)
+        super().__init__(width, height, fps)
+        if self.cap.isOpened():
+            self._negotiate(width, height, fps, formats, buffer_size)
+
+    def _negotiate(self, width, height, fps, formats, buffer_size):
+        for fmt in formats:
+            # The format has to be set before the size and rate, which the driver validates against it
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fmt))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+            if fourcc_string(self.cap.get(cv2.CAP_PROP_FOURCC)) == fmt:
+                break
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.format = fourcc_string(self.cap.get(cv2.CAP_PROP_FOURCC))
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _grab(self):
+        requested = time.monotonic()
+        ret, image = self.cap.read()
+        if not ret:
+            return None
+        now = time.monotonic()
+        # V4L2 reports the buffer's capture time on the monotonic clock; other backends may not
+        driver_time = self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        timestamp = driver_time if 0 <= now - driver_time <= MAX_PLAUSIBLE_AGE else max(requested, now - 1 / self.fps)
+        return Frame(image, timestamp, None)
+
+    def release(self):
+        self.cap.release()
+
+
+# A video file, played back at its own frame rate (or as fast as possible with realtime=False)
+class VideoFileSource(FrameSource):
+    def __init__(self, path, loop=False, realtime=True):
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video file {path!r}")
+        super().__init__(int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                         self.cap.get(cv2.CAP_PROP_FPS) or 30)
+        self.format = fourcc_string(self.cap.get(cv2.CAP_PROP_FOURCC))
+        self.loop = loop
+        self.realtime = realtime
+        self._next_time = None
+
+    def _pace(self):
+        if self.realtime:
+            now = time.monotonic()
+            self._next_time = max(now, self._next_time or now)
+            time.sleep(self._next_time - now)
+            self._next_time += 1 / self.fps
+
+    def _grab(self):
+        self._pace()
+        ret, image = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, image = self.cap.read()
+        return Frame(image, time.monotonic(), None) if ret else None
+
+    def release(self):
+        self.cap.release()
+
+
+# Saves the landmarks of a capture as an .npz file that LandmarkSource can replay
+class LandmarkRecorder:
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.times, self.counts, self.points = [], [], []
+
+    def add(self, timestamp, points):
+        self.times.append(timestamp)
+        self.counts.append(len(points))
+        self.points.append(np.asarray(points, dtype=np.float32).reshape(-1, 21, 3))
+
+    def save(self):
+        points = np.concatenate(self.points) if self.points else np.zeros((0, 21, 3), dtype=np.float32)
+        times = np.asarray(self.times, dtype=np.float64)
+        np.savez_compressed(self.path, times=times - (times[0] if len(times) else 0), counts=np.asarray(self.counts),
+                            points=points, size=np.array([self.width, self.height]))
+
+
+# Replays recorded landmarks with their original timing. Frames show the hand skeletons so the
+# apps can run on them, but the landmarks come with each frame and need no detection.
+class LandmarkSource(FrameSource):
+    def __init__(self, path, loop=False, realtime=True):
+        data = np.load(path)
+        width, height = (int(v) for v in data["size"])
+        self.times = data["times"]
+        self.points = np.split(data["points"], np.cumsum(data["counts"])[:-1])
+        duration = self.times[-1] if len(self.times) > 1 else 1
+        super().__init__(width, height, (len(self.times) - 1) / duration if duration else 30)
+        self.format = "landmarks"
+        self.loop = loop
+        self.realtime = realtime
+        self._index = 0
+        self._start = None
+
+    def _grab(self):
+        if self._index >= len(self.times):
+            if not self.loop or not len(self.times):
+                return None
+            self._index, self._start = 0, None
+        now = time.monotonic()
+        if self._start is None:
+            self._start = now - self.times[self._index]
+        if self.realtime:
+            time.sleep(max(0.0, self._start + self.times[self._index] - now))
+        points = self.points[self._index]
+        self._index += 1
+        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        draw_hands(image, points)
+        return Frame(image, time.monotonic(), points)
+
+
+# Generates moving hands from the synthetic hand model, cycling through the drawing gestures,
+# so the whole pipeline can be run and benchmarked without a camera
+class SyntheticSource(FrameSource):
+    GESTURES = ["01000", "01000", "01100", "01110", "00000"]  # Mostly drawing, some erasing, panning and idle
+
+    def __init__(self, width=1280, height=720, fps=30, hands=1, realtime=True, draw=True, seed=0):
+        super().__init__(width, height, fps)
+        self.format = "synthetic"
+        self.hands = hands
+        self.realtime = realtime
+        self.draw = draw
+        self._phases = np.random.default_rng(seed).uniform(0, 2 * np.pi, (hands, 2))
+        self._next_time = None
+
+    def landmarks(self, t):
+        hands = []
+        for hand, (phase_x, phase_y) in enumerate(self._phases):
+            gesture = self.GESTURES[int(t / 2 + hand) % len(self.GESTURES)]
+            pose = synthetic_hand([0.0 if bit == "1" else 1.0 for bit in gesture])
+            center = (0.5 + 0.3 * np.sin(0.7 * t + phase_x), 0.6 + 0.2 * np.sin(1.1 * t + phase_y))
+            points = np.zeros((21, 3), dtype=np.float32)
+            size = 0.25 * self.height
+            points[:, 0] = center[0] + pose[:, 0] * size / self.width
+            points[:, 1] = center[1] + pose[:, 1] * size / self.height
+            hands.append(points)
+        return np.stack(hands) if hands else np.zeros((0, 21, 3), dtype=np.float32)
+
+    def _grab(self):
+        now = time.monotonic()
+        if self.realtime:
+            self._next_time = max(now, self._next_time or now)
+            time.sleep(self._next_time - now)
+            self._next_time += 1 / self.fps
+        t = self.frames / self.fps
+        points = self.landmarks(t)
+        image = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        if self.draw:
+            draw_hands(image, points)
+        return Frame(image, time.monotonic(), points)
+
+
+# Function to open a source from a spec: a camera index, "synthetic", a recorded .npz or a video file
+def open_source(spec=0, width=1280, height=720, fps=30, **kwargs):
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height, fps, **kwargs)
+    if spec == "synthetic":
+        return SyntheticSource(width, height, fps, **kwargs)
+    if spec.endswith(".npz"):
+        return LandmarkSource(spec, **kwargs)
+    if os.path.exists(spec):
+        return VideoFileSource(spec, **kwargs)
+    raise IOError(f"Unknown video source {spec!r}")
+
+
+# Reports the negotiated format and measured frame rate and age of a source, optionally recording
+# its hand landmarks for later replay
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a capture source and optionally record hand landmarks.")
+    parser.add_argument("--source", default="0", help="Camera index, video file, recorded .npz or 'synthetic'")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--format", action="append", help="Pixel format to try, in order (default: MJPG then YUYV)")
+    parser.add_argument("--seconds", type=float, default=10, help="How long to capture")
+    parser.add_argument("--record", help="Detect hands and save their landmarks to this .npz file")
+    parser.add_argument("--show", action="store_true", help="Show the frames while capturing")
+    args = parser.parse_args()
+
+    kwargs = {"formats": tuple(args.format)} if args.format and args.source.isdigit() else {}
+    source = open_source(args.source, args.width, args.height, args.fps, **kwargs)
+    if not source.isOpened():
+        parser.error(f"Could not open {args.source}")
+    print(f"Source {args.source}: {source.width}x{source.height} {source.format} at {source.fps:.1f} FPS")
+
+    hands, recorder = None, None
+    if args.record:
+        import mediapipe
+        hands = mediapipe.solutions.hands.Hands(max_num_hands=2, min_detection_confidence=0.7)
+        recorder = LandmarkRecorder(args.record, source.width, source.height)
+
+    with source:
+        start = time.monotonic()
+        while time.monotonic() - start < args.seconds:
+            frame = source.read_frame()
+            if frame is None:
+                break
+            points = frame.landmarks
+            if hands is not None:
+                points = stack_landmarks(hands.process(cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)))[0]
+                recorder.add(frame.timestamp, points)
+            if args.show:
+                if points is not None and frame.landmarks is None:
+                    draw_hands(frame.image, points)
+                cv2.imshow("Capture", frame.image)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+        elapsed = time.monotonic() - start
+
+    median, p95 = source.age_stats()
+    print(f"{source.frames} frames in {elapsed:.1f}s ({source.frames / elapsed:.1f} FPS)")
+    if median is not None:
+        print(f"Frame age: median {median:.1f} ms, 95th percentile {p95:.1f} ms")
+    if recorder is not None:
+        recorder.save()
+        print(f"Saved landmarks to {args.record}")
+    if args.show:
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
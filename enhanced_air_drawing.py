@@ -11,25 +11,46 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import datetime
 import logging
+from stroke_processing import simplify_stroke, draw_stroke
+from layers import LayerStack
+from tiles import Viewport
+from gesture_classifier import GestureClassifier
+from hand_tracking import HandTracker, stack_landmarks
+from session_journal import SessionJournal
+from capture import open_source
 
 # Suppress TensorFlow warnings for a cleaner output
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
 logging.getLogger('tensorflow').setLevel(logging.ERROR)
 
 # Initialize Mediapipe hands module for gesture detection
+MAX_HANDS = 4  # Hands tracked at once, each drawing its own strokes
 mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7, min_tracking_confidence=0.7)
+hands = mp_hands.Hands(max_num_hands=MAX_HANDS, min_detection_confidence=0.7, min_tracking_confidence=0.7)
 mp_drawing = mp.solutions.drawing_utils
 
 # Canvas and drawing settings
-canvas_width, canvas_height = 1280, 720  # Increased resolution for larger window
-canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-drawing = False
-last_point = None
+canvas_width, canvas_height = 1280, 720  # Increased resolution for larger window (the canvas itself is unbounded)
+CAMERA_SOURCE = 0  # Camera index, video file, recorded landmarks (.npz) or "synthetic", see capture.py
 DRAW_COLOR = (255, 255, 255)  # Default white color
 DRAW_THICKNESS = 5  # Default thickness
-points_history = []  # To store drawing points for undo functionality
-current_action = "Idle"  # Track current action (Idle, Drawing, Erasing)
+current_action = "Idle"  # Current action of each hand (Idle, Drawing, Erasing, ...)
+SIMPLIFY_TOLERANCE = 1.5  # Max deviation (pixels) allowed when simplifying a finished stroke
+SMOOTH_STROKES = True  # Redraw stored strokes along a smooth spline
+MAX_TILES_IN_MEMORY = 512  # Canvas tiles kept in memory per layer when spilling is enabled
+TILE_SPILL_DIR = None  # Folder to spill least recently used tiles to (None keeps every tile in memory)
+ZOOM_SPEED = 0.005  # Zoom change per pixel of vertical hand movement
+layer_stack = LayerStack(SMOOTH_STROKES, MAX_TILES_IN_MEMORY, TILE_SPILL_DIR)  # Vector strokes per layer, used for undo
+SESSION_DIR = "session"  # Folder the drawing session is journaled to
+RESUME_SESSION = True  # Continue the last session on start instead of starting a new one
+session_journal = SessionJournal(SESSION_DIR)  # Records every change so a crash or quit loses nothing
+viewport = Viewport(canvas_width, canvas_height)  # Part of the canvas shown on screen
+OBJECT_ERASER = False  # Erase gesture deletes whole strokes instead of painting over pixels
+hand_tracker = HandTracker()  # Keeps each hand's id stable across frames
+hand_states = {}  # Hand id -> stroke in progress, erase stroke, pan/zoom anchor and colour slot of that hand
+GESTURE_ACTIONS = {"draw": "01000", "erase": "01100", "pan": "01110", "zoom": "01001", "clear": "01111"}  # Raised fingers, thumb to pinky
+gesture_classifier = GestureClassifier()  # Matches hand poses against built-in and recorded templates
+last_hand = None  # Landmarks of the hand in the current frame, used when recording a gesture
 
 # UI settings for a modern look
 UI_COLOR = (0, 255, 0)  # Green for UI text
@@ -205,28 +226,17 @@ def clear_temp_files():
     except Exception as e:
         print(f"Error clearing temporary files: {e}")
 
-# Function to undo the last drawing action
+# Function to undo the last drawing action (only the affected layer is re-rasterised)
 def undo_last_action():
-    global canvas, points_history
     try:
-        if points_history:
-            canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-            points_history.pop()  # Remove the last action
-            # Redraw the remaining points
-            for action in points_history:
-                if action["type"] == "draw":
-                    for i in range(1, len(action["points"])):
-                        cv2.line(canvas, action["points"][i-1], action["points"][i], action["color"], DRAW_THICKNESS)
-                elif action["type"] == "erase":
-                    cv2.circle(canvas, action["point"], action["radius"], (0, 0, 0), -1)
+        layer_stack.undo()
     except Exception as e:
         print(f"Error undoing last action: {e}")
 
 # Function to reset all settings
 def reset_all():
-    global canvas, points_history, DRAW_COLOR, current_color_name, DRAW_THICKNESS
-    canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-    points_history.clear()
+    global DRAW_COLOR, current_color_name, DRAW_THICKNESS
+    layer_stack.clear()
     DRAW_COLOR = (255, 255, 255)
     current_color_name = "White"
     DRAW_THICKNESS = 5
@@ -234,7 +244,7 @@ def reset_all():
 
 # Mouse callback function for button clicks and hover effects
 def mouse_callback(event, x, y, flags, param):
-    global mouse_x, mouse_y, canvas, is_searching, current_color_name, DRAW_COLOR, DRAW_THICKNESS, show_help
+    global mouse_x, mouse_y, is_searching, current_color_name, DRAW_COLOR, DRAW_THICKNESS, show_help
     mouse_x, mouse_y = x, y
 
     if event == cv2.EVENT_LBUTTONDOWN:
@@ -242,17 +252,16 @@ def mouse_callback(event, x, y, flags, param):
         if 10 <= x <= 150 and 40 <= y <= 70:
             if not is_searching:
                 print("Saving and searching...")
-                save_and_search(canvas)
+                save_and_search(layer_stack.render(viewport))
         # Retry Search button (if last search failed)
         elif 160 <= x <= 300 and 40 <= y <= 70 and search_failed:
             if not is_searching:
                 print("Retrying search...")
-                save_and_search(canvas)
+                save_and_search(layer_stack.render(viewport))
         # Clear Canvas button
         elif 310 <= x <= 450 and 40 <= y <= 70:
             print("Clearing canvas...")
-            canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-            points_history.clear()
+            layer_stack.clear()
         # Undo button
         elif 460 <= x <= 600 and 40 <= y <= 70:
             print("Undoing last action...")
@@ -264,7 +273,7 @@ def mouse_callback(event, x, y, flags, param):
         # Save Sketch button
         elif 10 <= x <= 150 and 80 <= y <= 110:
             print("Saving sketch...")
-            save_sketch(canvas)
+            save_sketch(layer_stack.render_extent())
         # Help button
         elif 160 <= x <= 300 and 80 <= y <= 110:
             show_help = not show_help
@@ -280,6 +289,9 @@ def mouse_callback(event, x, y, flags, param):
             print("Exiting...")
             if driver:
                 driver.quit()
+            for state in hand_states.values():
+                finish_stroke(state)
+            session_journal.close()
             cap.release()
             cv2.destroyAllWindows()
             clear_temp_files()
@@ -294,13 +306,11 @@ def mouse_callback(event, x, y, flags, param):
                 print(f"Selected color: {color_name}")
 
 # Main program
-cap = cv2.VideoCapture(0)
+cap = open_source(CAMERA_SOURCE, canvas_width, canvas_height)
 if not cap.isOpened():
     print("Error: Could not open webcam.")
     exit()
-
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, canvas_width)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, canvas_height)
+print(f"Camera: {cap.width}x{cap.height} {cap.format} at {cap.fps:.0f} FPS")
 
 # Set up the OpenCV window and maximize it
 cv2.namedWindow("Air Drawing with Direct Image Search", cv2.WND_PROP_FULLSCREEN)
@@ -310,6 +320,7 @@ cv2.setMouseCallback("Air Drawing with Direct Image Search", mouse_callback)
 print("Starting Air Drawing application...")
 print("Using Firefox browser for image search (Edge as fallback)")
 print("Use your index finger to draw")
+print(f"Up to {MAX_HANDS} hands can draw at once, each in its own colour")
 print("Click the 'Search Sketch' button to search for similar images")
 print("Click the 'Retry Search' button if the last search failed")
 print("Click the 'Clear Canvas' button to clear the canvas")
@@ -319,76 +330,166 @@ print("Click the 'Save Sketch' button to save the sketch")
 print("Click the 'Thickness +/-' buttons to adjust brush size")
 print("Click the 'Help' button to show/hide instructions")
 print("Click the 'Quit' button to exit")
-
-current_points = []  # To store points for the current drawing action
+print("Press 'n' for a new layer, 'l' to switch layer, 'h' to hide/show it, 'c' to recolor it")
+print("Raise index, middle and ring fingers to pan, index and pinky to zoom, press '0' to reset the view")
+print("Press 'e' to switch between erasing pixels and erasing whole strokes")
+
+if RESUME_SESSION:
+    restored = session_journal.resume(layer_stack)
+    if restored:
+        print(f"Resumed last session with {restored} strokes")
+else:
+    session_journal.reset(layer_stack)
+
+# Function to get the action for a gesture label: recorded gestures are named after their action,
+# built-in finger patterns match whatever the thumb is doing
+def gesture_action(gesture):
+    if gesture in GESTURE_ACTIONS:
+        return gesture
+    for action, fingers in GESTURE_ACTIONS.items():
+        if gesture is not None and gesture[1:] == fingers[1:]:
+            return action
+    return None
+
+# Function to create the drawing state of a newly tracked hand; the slot picks its colour
+def new_hand_state():
+    used = {state["slot"] for state in hand_states.values()}
+    return {"slot": min(set(range(len(used) + 1)) - used), "drawing": False, "last_point": None, "points": [],
+            "erase": None, "anchor": None, "action": "Idle"}
+
+# Function to get a hand's colour: the first hand uses the selected colour, the others the next ones along
+def hand_color(state):
+    names = list(COLORS)
+    return COLORS[names[(names.index(current_color_name) + state["slot"]) % len(names)]]
+
+# Function to store a hand's stroke in progress on the active layer
+def finish_stroke(state):
+    if state["drawing"] and state["points"]:
+        thickness = max(1, int(round(DRAW_THICKNESS / viewport.zoom)))  # Brush size is kept constant on screen
+        layer_stack.add_stroke({"type": "draw", "points": simplify_stroke(state["points"], SIMPLIFY_TOLERANCE),
+                                "color": hand_color(state), "thickness": thickness})
+    state["drawing"] = False
+    state["points"] = []
+    state["last_point"] = None
+
+# Function to advance one hand's gesture state machine for this frame
+def update_hand(state, action, x, y):
+    world_point = viewport.screen_to_world((x, y))
+    if action not in ("pan", "zoom"):
+        state["anchor"] = None
+    if action != "erase":
+        state["erase"] = None
+
+    if action == "draw":
+        state["action"] = "Drawing"
+        if not state["drawing"]:
+            state["drawing"] = True
+            state["last_point"] = world_point
+            state["points"] = [world_point]
+        elif state["last_point"] is not None:
+            state["points"].append(world_point)
+            state["last_point"] = world_point
+    elif action == "erase":
+        state["action"] = "Erasing"
+        finish_stroke(state)
+        erase_radius = max(1, int(round(20 / viewport.zoom)))
+        if OBJECT_ERASER:
+            layer_stack.erase_objects(world_point, erase_radius)
+        elif state["erase"] is None or not layer_stack.extend_stroke(state["erase"], [world_point]):
+            # One erase stroke per gesture instead of one record per frame
+            state["erase"] = {"type": "erase", "points": [world_point], "radius": erase_radius}
+            layer_stack.add_stroke(state["erase"])
+    elif action == "pan":
+        state["action"] = "Panning"
+        finish_stroke(state)
+        if state["anchor"] is not None:
+            viewport.pan(x - state["anchor"][0], y - state["anchor"][1])
+        state["anchor"] = (x, y)
+    elif action == "zoom":
+        state["action"] = "Zooming"
+        finish_stroke(state)
+        if state["anchor"] is not None:
+            # Moving the hand up zooms in around the fingertip, moving it down zooms out
+            viewport.zoom_at(np.exp((state["anchor"][1] - y) * ZOOM_SPEED), state["anchor"])
+            state["anchor"] = (state["anchor"][0], y)
+        else:
+            state["anchor"] = (x, y)
+    elif action == "clear":
+        state["action"] = "Idle"
+        if state["drawing"]:
+            layer_stack.clear()
+            state["last_point"] = None
+            state["drawing"] = False
+            state["points"] = []
+    else:
+        state["action"] = "Idle"
+        if state["drawing"]:
+            finish_stroke(state)
 
 while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
+    captured = cap.read_frame()
+    if captured is None:
         print("Failed to grab frame")
         break
 
-    frame = cv2.flip(frame, 1)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    result = hands.process(frame_rgb)
-
-    if result.multi_hand_landmarks:
-        for hand_landmarks in result.multi_hand_landmarks:
+    frame = cv2.flip(captured.image, 1)
+    viewport.height, viewport.width = frame.shape[:2]
+    if captured.landmarks is not None:
+        # Recorded or synthetic hands need no detection, they only need mirroring like the frame
+        result = None
+        hand_points = captured.landmarks.copy()
+        hand_points[:, :, 0] = 1 - hand_points[:, :, 0]
+        handedness = [None] * len(hand_points)
+    else:
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = hands.process(frame_rgb)
+        hand_points, handedness = stack_landmarks(result)
+
+    # All hands are classified and located together from one stacked (H, 21, 3) array
+    hand_ids, lost_ids = hand_tracker.update(hand_points, handedness)
+    for hand_id in lost_ids:
+        finish_stroke(hand_states.pop(hand_id))
+    last_hand = hand_points[0] if len(hand_points) else None
+
+    if len(hand_points):
+        for hand_landmarks in (result.multi_hand_landmarks if result is not None else []):
             mp_drawing.draw_landmarks(
                 frame, hand_landmarks, mp_hands.HAND_CONNECTIONS,
                 mp_drawing.DrawingSpec(color=(0, 0, 255), thickness=2, circle_radius=2),
                 mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
             )
 
-            index_tip = hand_landmarks.landmark[8]
-            h, w, _ = frame.shape
-            x, y = int(index_tip.x * w), int(index_tip.y * h)
-
-            index_up = index_tip.y < hand_landmarks.landmark[6].y
-            middle_up = hand_landmarks.landmark[12].y < hand_landmarks.landmark[10].y
-            ring_up = hand_landmarks.landmark[16].y < hand_landmarks.landmark[14].y
-            pinky_up = hand_landmarks.landmark[20].y < hand_landmarks.landmark[18].y
-
-            if index_up and not middle_up and not ring_up and not pinky_up:
-                current_action = "Drawing"
-                if not drawing:
-                    drawing = True
-                    last_point = (x, y)
-                    current_points = [last_point]
-                else:
-                    if last_point is not None:
-                        cv2.line(canvas, last_point, (x, y), DRAW_COLOR, DRAW_THICKNESS)
-                        current_points.append((x, y))
-                        last_point = (x, y)
-            elif index_up and middle_up and not ring_up and not pinky_up:
-                current_action = "Erasing"
-                erase_radius = 20
-                cv2.circle(canvas, (x, y), erase_radius, (0, 0, 0), -1)
-                points_history.append({"type": "erase", "point": (x, y), "radius": erase_radius})
-                last_point = None
-                current_points = []
-            elif index_up and middle_up and ring_up and pinky_up:
-                current_action = "Idle"
-                if drawing:
-                    canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
-                    points_history.clear()
-                    last_point = None
-                    drawing = False
-                    current_points = []
-            else:
-                current_action = "Idle"
-                if drawing:
-                    drawing = False
-                    if current_points:
-                        points_history.append({"type": "draw", "points": current_points, "color": DRAW_COLOR})
-                    current_points = []
-                    last_point = None
-
+        h, w, _ = frame.shape
+        tips = (hand_points[:, 8, :2] * (w, h)).astype(int)
+        gestures = gesture_classifier.classify_batch(hand_points, w / h)
+        # Where no template is close enough, compare each fingertip with its middle joint instead
+        raised = hand_points[:, [8, 12, 16, 20], 1] < hand_points[:, [6, 10, 14, 18], 1]
+        for hand_id, gesture, fingers, (x, y) in zip(hand_ids, gestures, raised, tips.tolist()):
+            if gesture is None:
+                gesture = "0" + "".join("1" if up else "0" for up in fingers)
+            if hand_id not in hand_states:
+                hand_states[hand_id] = new_hand_state()
+            update_hand(hand_states[hand_id], gesture_action(gesture), x, y)
+    current_action = ", ".join(hand_states[hand_id]["action"] for hand_id in hand_ids) or "Idle"
+
+    canvas = layer_stack.render(viewport)
+    live = [state for state in hand_states.values() if state["drawing"] and len(state["points"]) > 1]
+    if live:
+        # Strokes in progress are drawn on a copy so the cached view stays untouched
+        canvas = canvas.copy()
+        for state in live:
+            draw_stroke(canvas, viewport.world_to_screen(state["points"]), hand_color(state), DRAW_THICKNESS, smooth=False)
     frame_with_canvas = cv2.addWeighted(frame, 1, canvas, 0.7, 0)
 
     # Draw status bar at the top with a modern look
     cv2.rectangle(frame_with_canvas, (0, 0), (canvas_width, 30), (30, 30, 30), -1)
     status_text = f"Mode: {current_action} | Color: {current_color_name} | Thickness: {DRAW_THICKNESS}"
+    status_text += f" | {layer_stack.active_layer.name} ({layer_stack.active + 1}/{len(layer_stack.layers)})"
+    status_text += f" | Zoom: {viewport.zoom:.2f}x"
+    if OBJECT_ERASER:
+        status_text += " | Object eraser"
+    if not layer_stack.active_layer.visible:
+        status_text += " hidden"
     if is_searching:
         status_text += " | Searching Google Images..."
     elif search_failed:
@@ -397,13 +498,17 @@ while cap.isOpened():
 
     # Draw instructions (hidden by default, toggled by Help button)
     if show_help:
-        help_box = np.zeros((200, 300, 3), dtype=np.uint8)
+        help_box = np.zeros((260, 300, 3), dtype=np.uint8)
         help_box[:] = (50, 50, 50)  # Dark gray background
         cv2.putText(help_box, "Index finger: Draw", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
         cv2.putText(help_box, "Index+Middle: Erase", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
         cv2.putText(help_box, "All fingers up: Clear", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
         cv2.putText(help_box, "Click buttons to use", (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
-        frame_with_canvas[120:320, 10:310] = help_box
+        cv2.putText(help_box, "N/L/H/C keys: Layers", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
+        cv2.putText(help_box, "3 fingers: Pan, I+P: Zoom", (10, 180), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
+        cv2.putText(help_box, "E key: Object eraser", (10, 210), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
+        cv2.putText(help_box, "1-5 keys: Record gesture", (10, 240), cv2.FONT_HERSHEY_SIMPLEX, 0.6, UI_COLOR, 2)
+        frame_with_canvas[120:380, 10:310] = help_box
 
     # Draw buttons with hover effects
     # Search Sketch button
@@ -473,7 +578,35 @@ while cap.isOpened():
         if driver:
             driver.quit()
         break
-
+    elif key == ord('n'):
+        layer_stack.add_layer()
+        print(f"Added {layer_stack.active_layer.name}")
+    elif key == ord('l'):
+        layer_stack.select_next_layer()
+        print(f"Active layer: {layer_stack.active_layer.name}")
+    elif key == ord('h'):
+        visible = layer_stack.toggle_visibility()
+        print(f"{layer_stack.active_layer.name} {'shown' if visible else 'hidden'}")
+    elif key == ord('e'):
+        OBJECT_ERASER = not OBJECT_ERASER
+        print(f"Eraser mode: {'object' if OBJECT_ERASER else 'pixel'}")
+    elif key == ord('0'):
+        viewport.reset()
+    elif key == ord('c'):
+        layer_stack.recolor_layer(DRAW_COLOR)
+        print(f"{layer_stack.active_layer.name} recolored to {current_color_name}")
+    elif ord('1') <= key <= ord('5'):
+        # Record the current hand pose as the gesture for draw, erase, pan, zoom or clear
+        action = list(GESTURE_ACTIONS)[key - ord('1')]
+        if last_hand is not None:
+            gesture_classifier.record(action, last_hand, frame.shape[1] / frame.shape[0])
+            print(f"Recorded gesture for {action}")
+        else:
+            print("No hand in view to record")
+
+for state in hand_states.values():
+    finish_stroke(state)
+session_journal.close()
 cap.release()
 cv2.destroyAllWindows()
 clear_temp_files()
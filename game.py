@@ -1,93 +1,72 @@
 import cv2
 import mediapipe as mp
-import numpy as np
+from board_renderer import BoardRenderer
+from board_engine import BoardGame
+from gesture_classifier import GestureClassifier, landmarks_to_array, finger_count as template_finger_count
+from capture import open_source
+from timing import GestureFilter
 
 # Initialize MediaPipe Hands
 mp_hands = mp.solutions.hands
 hands = mp_hands.Hands(max_num_hands=1, min_detection_confidence=0.7)
 
+# Board settings, e.g. 6, 7, 4 with GRAVITY = True for Connect-Four or 15, 15, 5 for Gomoku
+BOARD_ROWS, BOARD_COLS, WIN_LENGTH = 3, 3, 3
+GRAVITY = False  # Marks drop to the lowest free cell of the chosen column
+AI_FRAME_BUDGET_MS = 15  # Search time the computer may use per video frame
+AI_THINK_MS = 1500  # Total search time for one computer move
+GESTURE_HOLD_S = 0.4  # How long a gesture must be held before it is accepted
+CAMERA_SOURCE = 0  # Camera index or video file
+
 # Initialize game state
-board = np.zeros((3, 3), dtype=int)
+game = BoardGame(BOARD_ROWS, BOARD_COLS, WIN_LENGTH, GRAVITY)
 player_turn = 1  # Player 1 starts with 'X'
+ai_search = None  # Computer move being searched over several frames
 winner = None
 game_mode = None  # None for menu, 1 for multiplayer, 2 for single-player
 play_again = False
 
-# Function to draw the Tic-Tac-Toe board
-def draw_board(img):
-    for i in range(1, 3):
-        cv2.line(img, (i*300, 0), (i*300, 900), (255, 255, 255), 6)
-        cv2.line(img, (0, i*300), (900, i*300), (255, 255, 255), 6)
-
-# Function to draw X and O on the board
-def draw_XO(img, board):
-    for i in range(3):
-        for j in range(3):
-            if board[i, j] == 1:
-                cv2.putText(img, 'X', (j*300+90, i*300+210), cv2.FONT_HERSHEY_SIMPLEX, 6, (255, 0, 0), 15)
-            elif board[i, j] == 2:
-                cv2.putText(img, 'O', (j*300+90, i*300+210), cv2.FONT_HERSHEY_SIMPLEX, 6, (0, 255, 0), 15)
-
-# Function to check for a winner
-def check_winner(board):
-    for i in range(3):
-        if np.all(board[i, :] == board[i, 0]) and board[i, 0] != 0:
-            return board[i, 0]
-        if np.all(board[:, i] == board[0, i]) and board[0, i] != 0:
-            return board[0, i]
-    if board[0, 0] == board[1, 1] == board[2, 2] != 0:
-        return board[0, 0]
-    if board[0, 2] == board[1, 1] == board[2, 0] != 0:
-        return board[0, 2]
-    if np.all(board != 0):
-        return -1  # Draw
-    return None
-
-# Minimax algorithm for the computer player
-def minimax(board, depth, is_maximizing):
-    scores = {1: -1, 2: 1, -1: 0}  # Scores for X (player 1), O (computer), and draw
-    winner = check_winner(board)
-    if winner is not None:
-        return scores[winner]
-
-    if is_maximizing:
-        best_score = -np.inf
-        for i in range(3):
-            for j in range(3):
-                if board[i, j] == 0:
-                    board[i, j] = 2
-                    score = minimax(board, depth + 1, False)
-                    board[i, j] = 0
-                    best_score = max(score, best_score)
-        return best_score
-    else:
-        best_score = np.inf
-        for i in range(3):
-            for j in range(3):
-                if board[i, j] == 0:
-                    board[i, j] = 1
-                    score = minimax(board, depth + 1, True)
-                    board[i, j] = 0
-                    best_score = min(score, best_score)
-        return best_score
-
-# Function to get the best move for the computer
-def get_best_move(board):
-    best_score = -np.inf
-    move = None
-    for i in range(3):
-        for j in range(3):
-            if board[i, j] == 0:
-                board[i, j] = 2
-                score = minimax(board, 0, False)
-                board[i, j] = 0
-                if score > best_score:
-                    best_score = score
-                    move = (i, j)
-    return move
-
-# Function to count fingers
+# Cached renderer for the Tic-Tac-Toe grid and the X/O marks
+board_renderer = BoardRenderer(BOARD_ROWS, BOARD_COLS, 900, 900)
+
+# Template classifier for hand poses. Only the built-in finger patterns are used: poses recorded
+# in the drawing app are labelled with drawing actions, not finger counts
+gesture_classifier = GestureClassifier(templates_file=None)
+
+# Recent gestures, so a move or menu choice is only taken once it has been held steadily
+gesture_filter = GestureFilter(window=GESTURE_HOLD_S * 1.5, dwell=GESTURE_HOLD_S)
+
+# Function to record this frame's gesture, returns it once it has been held long enough
+def confirm_gesture(gesture):
+    gesture_filter.push(gesture)
+    confirmed = gesture_filter.confirmed()
+    if confirmed is not None:
+        gesture_filter.reset()  # Start over so a held gesture is accepted only once
+    return confirmed
+
+# Function to play a move and update the turn and the winner
+def make_move(cell):
+    global player_turn, winner
+    game.play(cell)
+    player_turn = game.to_move
+    winner = game.winner()
+
+# Function to spend this frame's time budget on the computer's move, playing it once the search is done
+def computer_turn():
+    global ai_search
+    if ai_search is None:
+        ai_search = game.search(AI_THINK_MS)
+    if ai_search.step(AI_FRAME_BUDGET_MS):
+        make_move(ai_search.best_move)
+        ai_search = None
+
+# Function to count fingers, taken from the closest gesture template when one matches and
+# from the fingertip heights otherwise
 def count_fingers(lst):
+    count = template_finger_count(gesture_classifier.classify(landmarks_to_array(lst), camera_aspect))
+    if count is not None:
+        return count
+
     count = 0
     threshold = (lst.landmark[0].y * 100 - lst.landmark[9].y * 100) / 2
 
@@ -104,14 +83,16 @@ def count_fingers(lst):
 
     return count
 
-# Function to get the gesture position
+# Function to get the gesture position as a (column, row) board cell
 def get_position(landmarks):
-    x = int(landmarks.landmark[8].x * 900)
-    y = int(landmarks.landmark[8].y * 900)
-    return x // 300, y // 300
+    x = int(landmarks.landmark[8].x * BOARD_COLS)
+    y = int(landmarks.landmark[8].y * BOARD_ROWS)
+    return x, y
 
-# Initialize video capture
-cap = cv2.VideoCapture(0)
+# Initialize video capture (format, size, frame rate and buffering are negotiated in capture.py)
+cap = open_source(CAMERA_SOURCE)
+# Landmarks are found on the frame squashed to 900x900, so they keep the camera's aspect ratio
+camera_aspect = cap.width / cap.height
 
 while True:
     ret, frame = cap.read()
@@ -124,15 +105,18 @@ while True:
     if game_mode is None:
         results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
 
+        finger_count = None
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
                 finger_count = count_fingers(hand_landmarks)
-                if finger_count == 1:
-                    game_mode = 2  # Single-player
-                elif finger_count == 2:
-                    game_mode = 1  # Multiplayer
                 mp.solutions.drawing_utils.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
 
+        gesture = confirm_gesture(finger_count)
+        if gesture == 1:
+            game_mode = 2  # Single-player
+        elif gesture == 2:
+            game_mode = 1  # Multiplayer
+
         cv2.putText(frame, 'Show 1 finger to play alone', (60, 450), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (0, 255, 255), 3)
         cv2.putText(frame, 'Show 2 fingers to play with a friend', (60, 540), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (0, 255, 255), 3)
         cv2.imshow("Tic-Tac-Toe", frame)
@@ -141,18 +125,22 @@ while True:
     elif play_again:
         results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
 
+        finger_count = None
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
                 finger_count = count_fingers(hand_landmarks)
-                if finger_count == 3:
-                    board = np.zeros((3, 3), dtype=int)
-                    player_turn = 1
-                    winner = None
-                    play_again = False
-                elif finger_count == 4:
-                    break
                 mp.solutions.drawing_utils.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
 
+        gesture = confirm_gesture(finger_count)
+        if gesture == 3:
+            game.reset()
+            ai_search = None
+            player_turn = 1
+            winner = None
+            play_again = False
+        elif gesture == 4:
+            break
+
         cv2.putText(frame, 'Show 3 fingers to play again', (60, 450), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (0, 255, 255), 3)
         cv2.putText(frame, 'Show 4 fingers to quit', (60, 540), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (0, 255, 255), 3)
         cv2.imshow("Tic-Tac-Toe", frame)
@@ -161,26 +149,25 @@ while True:
     else:
         results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
 
+        fist_position = None  # A move is a fist held over the same cell
         if results.multi_hand_landmarks:
             for hand_landmarks in results.multi_hand_landmarks:
-                finger_count = count_fingers(hand_landmarks)
-                if finger_count == 0:
-                    x, y = get_position(hand_landmarks)
-                    if x < 3 and y < 3 and board[y, x] == 0:
-                        if game_mode == 1 or (game_mode == 2 and player_turn == 1):
-                            board[y, x] = player_turn
-                            player_turn = 3 - player_turn  # Switch turns
-                            winner = check_winner(board)
-                            if game_mode == 2 and winner is None:
-                                move = get_best_move(board)
-                                if move:
-                                    board[move[0], move[1]] = player_turn
-                                    player_turn = 3 - player_turn  # Switch turns
-                                    winner = check_winner(board)
+                if count_fingers(hand_landmarks) == 0:
+                    fist_position = get_position(hand_landmarks)
                 mp.solutions.drawing_utils.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
 
-        draw_board(frame)
-        draw_XO(frame, board)
+        position = confirm_gesture(fist_position)
+        if position is not None:
+            x, y = position
+            cell = game.target_cell(y, x)
+            if cell is not None and winner is None:
+                if game_mode == 1 or (game_mode == 2 and player_turn == 1):
+                    make_move(cell)
+
+        if game_mode == 2 and player_turn == 2 and winner is None:
+            computer_turn()
+
+        board_renderer.draw(frame, game.board)
 
         if winner is not None:
             if winner == -1:
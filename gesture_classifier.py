@@ -0,0 +1,141 @@
+import json
+import os
+import numpy as np
+
+TEMPLATES_FILE = "gesture_templates.json"  # Gestures recorded by the user
+MAX_DISTANCE = 0.35  # Largest RMS landmark distance (in palm lengths) accepted as a match
+
+FINGERS = "TIMRP"  # Thumb, index, middle, ring, pinky: built-in gesture labels are strings like "01100"
+MCP_POSITIONS = [(0.32, -0.95), (0.05, -1.0), (-0.2, -0.93), (-0.42, -0.82)]  # Index..pinky knuckles
+SEGMENT_LENGTHS = [(0.42, 0.25, 0.2), (0.46, 0.28, 0.21), (0.43, 0.26, 0.2), (0.33, 0.2, 0.18)]
+SPLAY_ANGLES = [0.12, 0.0, -0.1, -0.22]  # Fan-out of straight fingers, radians from vertical
+
+
+# Function to convert MediaPipe hand landmarks to a (21, 3) array
+def landmarks_to_array(hand_landmarks):
+    return np.array([(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark], dtype=np.float32)
+
+
+# Function to normalise (..., 21, 2+) landmark arrays into (..., 42) vectors: the wrist is moved to the
+# origin, the hand is rotated so the wrist-to-middle-knuckle direction points up, scaled so that distance
+# is 1, and mirrored so left and right hands look the same. MediaPipe gives x as a fraction of the frame
+# width and y of its height, so x is first scaled by the frame's aspect ratio (width / height).
+def normalize_landmarks(points, aspect=1.0):
+    pts = np.asarray(points, dtype=np.float32)[..., :2] * np.array([aspect, 1.0], dtype=np.float32)
+    pts = pts - pts[..., :1, :]
+    axis = pts[..., 9, :]
+    length = np.linalg.norm(axis, axis=-1, keepdims=True)
+    length = np.where(length == 0, 1, length)
+    up = axis / length
+    # Rotate so that `up` maps to (0, -1): new_x = -up_y * x + up_x * y, new_y = -up_x * x - up_y * y
+    x, y = pts[..., 0], pts[..., 1]
+    ux, uy = up[..., :1], up[..., 1:]
+    rotated = np.stack([-uy * x + ux * y, -ux * x - uy * y], axis=-1) / length[..., None]
+    # Mirror so the index knuckle is always on the +x side of the pinky knuckle
+    flip = np.where(rotated[..., 5:6, 0] < rotated[..., 17:18, 0], -1.0, 1.0)
+    rotated[..., 0] *= flip
+    return rotated.reshape(rotated.shape[:-2] + (42,))
+
+
+# Function to build a synthetic hand pose: curls holds one value per finger (thumb first),
+# 0 for a straight finger and 1 for a fully curled one
+def synthetic_hand(curls, splay=1.0):
+    pts = np.zeros((21, 2), dtype=np.float32)
+    # Thumb swings from pointing out to the side across the palm as it curls
+    pts[1] = (0.25, -0.2)
+    for joint, (length, bend) in enumerate(zip((0.3, 0.25, 0.2), (0.5, 1.5, 2.2)), start=2):
+        angle = 0.9 * splay - curls[0] * bend
+        pts[joint] = pts[joint - 1] + length * np.array([np.sin(angle), -np.cos(angle)])
+    # Other fingers fold towards the palm, so in the image their segments shorten and turn back down
+    for finger in range(4):
+        base = 5 + 4 * finger
+        pts[base] = MCP_POSITIONS[finger]
+        angle = 0.0
+        for joint, (length, bend) in enumerate(zip(SEGMENT_LENGTHS[finger], (1.2, 1.6, 1.0)), start=1):
+            angle += curls[finger + 1] * bend
+            splay_angle = SPLAY_ANGLES[finger] * splay
+            pts[base + joint] = pts[base + joint - 1] + length * np.array([np.sin(splay_angle), -np.cos(angle)])
+    return pts
+
+
+# Function to generate the built-in templates: every combination of straight and curled fingers,
+# in a few degrees of straightness
+def builtin_templates():
+    poses, labels = [], []
+    for code in range(32):
+        label = format(code, "05b")
+        for straight, curled, splay in ((0.0, 1.0, 1.0), (0.15, 0.75, 1.0), (0.0, 0.85, 0.5), (0.1, 1.0, 1.5)):
+            poses.append(synthetic_hand([straight if bit == "1" else curled for bit in label], splay))
+            labels.append(label)
+    return normalize_landmarks(np.stack(poses)), labels
+
+
+# Function to count the raised fingers of a built-in gesture label, None for user-defined gestures
+def finger_count(label):
+    if label is not None and len(label) == len(FINGERS) and set(label) <= {"0", "1"}:
+        return label.count("1")
+    return None
+
+
+# k-nearest-neighbour gesture classifier over a matrix of normalised templates: classifying any number
+# of hands is one batched distance computation, so adding gestures barely changes the per-frame cost
+class GestureClassifier:
+    def __init__(self, templates_file=TEMPLATES_FILE, k=3, max_distance=MAX_DISTANCE):
+        self.templates_file = templates_file
+        self.k = k
+        self.max_distance = max_distance
+        self._builtin, self._builtin_labels = builtin_templates()
+        self.user_templates = {}
+        if templates_file and os.path.exists(templates_file):
+            try:
+                with open(templates_file) as f:
+                    self.user_templates = {label: [np.array(v, dtype=np.float32) for v in vectors]
+                                           for label, vectors in json.load(f).items()}
+            except Exception as e:
+                print(f"Error loading gesture templates: {e}")
+        self._rebuild()
+
+    def _rebuild(self):
+        user = [(label, v) for label, vectors in self.user_templates.items() for v in vectors]
+        self.templates = np.vstack([self._builtin] + [v[None] for _, v in user])
+        self.labels = self._builtin_labels + [label for label, _ in user]
+        self._norms = np.einsum("ij,ij->i", self.templates, self.templates)
+
+    # Stores the given (21, 2+) landmarks, from a frame with the given aspect ratio, as another example
+    # of a gesture and saves the template file
+    def record(self, label, points, aspect=1.0):
+        self.user_templates.setdefault(label, []).append(normalize_landmarks(points, aspect))
+        self._rebuild()
+        if self.templates_file:
+            try:
+                with open(self.templates_file, "w") as f:
+                    json.dump({label: [v.tolist() for v in vectors] for label, vectors in self.user_templates.items()}, f)
+            except Exception as e:
+                print(f"Error saving gesture templates: {e}")
+
+    # Classifies an (H, 21, 2+) array of hands from a frame with the given aspect ratio (width / height),
+    # returns a label (or None when nothing is close) per hand
+    def classify_batch(self, points, aspect=1.0):
+        queries = normalize_landmarks(points, aspect)
+        if queries.shape[0] == 0:
+            return []
+        # Squared distances to every template in one matrix product
+        distances = np.einsum("ij,ij->i", queries, queries)[:, None] + self._norms[None, :] - 2 * queries @ self.templates.T
+        rms = np.sqrt(np.maximum(distances, 0) / 21)
+        k = min(self.k, rms.shape[1])
+        nearest = np.argpartition(rms, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(rms, nearest):
+            candidates = candidates[np.argsort(row[candidates])]
+            if self.max_distance is not None and row[candidates[0]] > self.max_distance:
+                results.append(None)
+                continue
+            votes = {}
+            for index in candidates:
+                votes[self.labels[index]] = votes.get(self.labels[index], 0) + 1
+            # Most votes wins; votes were counted closest first, so ties go to the closest template
+            results.append(max(votes, key=votes.get))
+        return results
+
+    def classify(self, points, aspect=1.0):
+        return self.classify_batch(np.asarray(points)[None], aspect)[0]
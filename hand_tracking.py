@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+from gesture_classifier import landmarks_to_array
+
+MAX_MATCH_DISTANCE = 0.2  # Largest palm movement between frames (fraction of the frame) still treated as the same hand
+MAX_MISSED_FRAMES = 5  # Frames a hand may go undetected before its track is dropped
+PALM_POINTS = [0, 5, 9, 13, 17]  # Wrist and knuckles, steadier than the fingertips
+# Bones between the 21 landmarks (same topology as MediaPipe's HAND_CONNECTIONS)
+HAND_CONNECTIONS = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10), (10, 11),
+                    (11, 12), (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17), (17, 18), (18, 19), (19, 20)]
+
+
+# Function to stack a MediaPipe result into an (H, 21, 3) landmark array and the handedness labels
+def stack_landmarks(result):
+    if not result.multi_hand_landmarks:
+        return np.zeros((0, 21, 3), dtype=np.float32), []
+    points = np.stack([landmarks_to_array(hand) for hand in result.multi_hand_landmarks])
+    if result.multi_handedness:
+        labels = [handedness.classification[0].label for handedness in result.multi_handedness]
+    else:
+        labels = [None] * len(points)
+    return points, labels
+
+
+# Function to draw an (H, 21, 2+) array of normalised landmarks on a frame
+def draw_hands(frame, points, connections=HAND_CONNECTIONS):
+    h, w = frame.shape[:2]
+    for hand in (np.asarray(points)[:, :, :2] * (w, h)).astype(int).tolist():
+        for a, b in connections:
+            cv2.line(frame, tuple(hand[a]), tuple(hand[b]), (0, 255, 0), 2)
+        for x, y in hand:
+            cv2.circle(frame, (x, y), 2, (0, 0, 255), -1)
+
+
+# Gives every detected hand an id that stays the same from frame to frame. Detections are matched to
+# the tracks' predicted palm centres closest pair first, using one distance matrix for all hands;
+# a handedness mismatch makes a pair look further apart.
+class HandTracker:
+    def __init__(self, max_distance=MAX_MATCH_DISTANCE, max_missed=MAX_MISSED_FRAMES):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.tracks = {}  # Hand id -> {"center", "velocity", "label", "missed"}
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def clear(self):
+        self.tracks.clear()
+
+    # Matches an (H, 21, 2+) landmark array, returns (hand id per row, ids of tracks dropped this frame)
+    def update(self, points, labels=None):
+        points = np.asarray(points, dtype=np.float32)
+        labels = labels if labels is not None else [None] * len(points)
+        centers = points[:, PALM_POINTS, :2].mean(axis=1) if len(points) else np.zeros((0, 2), dtype=np.float32)
+        track_ids = list(self.tracks)
+        assigned = [None] * len(points)
+
+        if track_ids and len(points):
+            predicted = np.array([self.tracks[i]["center"] + self.tracks[i]["velocity"] for i in track_ids])
+            cost = np.linalg.norm(centers[:, None, :] - predicted[None, :, :], axis=2)
+            track_labels = [self.tracks[i]["label"] for i in track_ids]
+            mismatch = np.array([[None not in (label, other) and label != other for other in track_labels] for label in labels])
+            cost += mismatch * (self.max_distance / 2)
+            used_tracks = set()
+            for flat in np.argsort(cost, axis=None):
+                row, col = divmod(int(flat), len(track_ids))
+                if cost[row, col] > self.max_distance:
+                    break
+                if assigned[row] is None and col not in used_tracks:
+                    assigned[row] = track_ids[col]
+                    used_tracks.add(col)
+
+        for row, hand_id in enumerate(assigned):
+            if hand_id is None:
+                hand_id = assigned[row] = self._next_id
+                self._next_id += 1
+                self.tracks[hand_id] = {"center": centers[row], "velocity": np.zeros(2, dtype=np.float32),
+                                        "label": labels[row], "missed": 0}
+                continue
+            track = self.tracks[hand_id]
+            track["velocity"] = centers[row] - track["center"]
+            track["center"] = centers[row]
+            track["label"] = labels[row] or track["label"]
+            track["missed"] = 0
+
+        lost = []
+        for hand_id in track_ids:
+            if hand_id in assigned:
+                continue
+            track = self.tracks[hand_id]
+            track["missed"] += 1
+            track["velocity"] = np.zeros(2, dtype=np.float32)
+            if track["missed"] > self.max_missed:
+                del self.tracks[hand_id]
+                lost.append(hand_id)
+        return assigned, lost
@@ -0,0 +1,241 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from capture import open_source
+from hand_tracking import draw_hands, stack_landmarks
+
+RING_SLOTS = 4  # Frames buffered per source; a frame is dropped when its slot is still being processed
+FREE, PENDING = 0, 1  # Slot states kept in the ring's header bytes
+
+# Compact detection result sent back from a worker: points is an (H, 21, 3) float32 array
+LandmarkResult = namedtuple("LandmarkResult", ["source", "seq", "timestamp", "points", "handedness", "shape"])
+
+
+# Ring of equally sized frames in shared memory. The first `slots` bytes hold each slot's state:
+# the capture side only writes FREE slots and marks them PENDING, a worker marks them FREE again
+# once it has taken its copy, so frames never travel through a pipe.
+class FrameRing:
+    def __init__(self, shape, slots=RING_SLOTS, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots + slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.state = np.ndarray((slots,), dtype=np.uint8, buffer=self.shm.buf)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=slots)
+        if self.owner:
+            self.state[:] = FREE
+        self._next = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # Returns the index of a free slot to write into, or None if the ring is full. Workers finish out
+    # of order, so every slot is checked, starting after the last one written.
+    def acquire(self):
+        free = np.flatnonzero(np.roll(self.state, -self._next) == FREE)
+        if len(free) == 0:
+            return None
+        slot = (self._next + int(free[0])) % self.slots
+        self._next = (slot + 1) % self.slots
+        return slot
+
+    def close(self):
+        del self.state, self.frames  # The views must go before the mapping can be closed
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# Worker process: one MediaPipe Hands instance, rings attached by name the first time they are seen
+def _worker(tasks, results, hands_kwargs):
+    import mediapipe
+    hands = mediapipe.solutions.hands.Hands(**hands_kwargs)
+    rings = {}
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            source, ring_name, shape, slot, seq, timestamp = task
+            if ring_name not in rings:
+                rings[ring_name] = FrameRing(shape, name=ring_name)
+            ring = rings[ring_name]
+            rgb = cv2.cvtColor(ring.frames[slot], cv2.COLOR_BGR2RGB)
+            ring.state[slot] = FREE
+            points, handedness = stack_landmarks(hands.process(rgb))
+            results.put(LandmarkResult(source, seq, timestamp, points, handedness, shape))
+    finally:
+        for ring in rings.values():
+            ring.close()
+        hands.close()
+
+
+# Reads one capture source (see capture.py) on a thread, writing frames straight into its ring and
+# queueing them for detection. The latest frames are also kept for display.
+class CaptureSource:
+    def __init__(self, index, source, tasks, slots=RING_SLOTS, flip=True):
+        self.index = index
+        self.source = source
+        self.flip = flip
+        self.cap = open_source(source)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video source {source!r}")
+        frame = self.cap.read_frame()
+        if frame is None:
+            raise IOError(f"Could not read from video source {source!r}")
+        self.ring = FrameRing(frame.image.shape, slots)
+        self.latest = {}  # Sequence number -> frame, for the frames still waiting on a result
+        self.captured = 0
+        self.dropped = 0
+        self.finished = False
+        self._lock = threading.Lock()
+        self._tasks = tasks
+        self._running = True
+        self._first = frame
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        frame, self._first = self._first, None  # Files and recordings pace themselves to their frame rate
+        while self._running:
+            if frame is None:
+                frame = self.cap.read_frame()
+                if frame is None:
+                    break
+            slot = self.ring.acquire()
+            if slot is None:
+                self.dropped += 1  # Workers are behind: skip the frame instead of queueing latency
+            else:
+                if self.flip:
+                    cv2.flip(frame.image, 1, dst=self.ring.frames[slot])
+                else:
+                    self.ring.frames[slot] = frame.image
+                self.ring.state[slot] = PENDING
+                seq = self.captured
+                with self._lock:
+                    self.latest[seq] = self.ring.frames[slot].copy()
+                    for old in [s for s in self.latest if s <= seq - self.ring.slots * 2]:
+                        del self.latest[old]
+                self._tasks.put((self.index, self.ring.name, self.ring.shape, slot, seq, frame.timestamp))
+            self.captured += 1
+            frame = None
+        self.finished = True
+
+    # Returns the captured frame matching a result, or None once it has been discarded
+    def frame(self, seq):
+        with self._lock:
+            return self.latest.get(seq)
+
+    # Stops capturing, so no more tasks are queued for this source
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=1)
+
+    def close(self):
+        self.stop()
+        self.cap.release()
+        self.ring.close()
+
+
+# Runs hand detection for several sources on a pool of worker processes, each with its own
+# MediaPipe Hands instance. Frames are shared through FrameRings; only task tuples and the
+# compact landmark arrays go through the queues.
+class InferencePool:
+    def __init__(self, workers=None, slots=RING_SLOTS, flip=True, **hands_kwargs):
+        self.slots = slots
+        self.flip = flip
+        self.hands_kwargs = hands_kwargs or {"max_num_hands": 2, "min_detection_confidence": 0.7}
+        context = mp.get_context("spawn")  # MediaPipe and OpenCV state must not be forked
+        self.tasks = context.Queue()
+        self.results = context.Queue()
+        self.sources = []
+        self.workers = [context.Process(target=_worker, args=(self.tasks, self.results, self.hands_kwargs), daemon=True)
+                        for _ in range(workers or max(1, (os.cpu_count() or 2) - 1))]
+        for worker in self.workers:
+            worker.start()
+
+    # Opens a camera index or video file, returns its source index
+    def attach(self, source):
+        self.sources.append(CaptureSource(len(self.sources), source, self.tasks, self.slots, self.flip))
+        return len(self.sources) - 1
+
+    # Returns the results that have arrived, waiting up to timeout seconds for the first one
+    def poll(self, timeout=0.0):
+        collected = []
+        try:
+            collected.append(self.results.get(timeout=timeout) if timeout else self.results.get_nowait())
+            while True:
+                collected.append(self.results.get_nowait())
+        except queue.Empty:
+            pass
+        return collected
+
+    # Stops the workers before the sources, whose rings may still be named in queued tasks
+    def close(self):
+        for source in self.sources:
+            source.stop()
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2)
+            if worker.is_alive():
+                worker.terminate()
+        for source in self.sources:
+            source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Shows every source in its own window with its landmarks, detection rate and latency
+def main():
+    parser = argparse.ArgumentParser(description="Run hand detection for several cameras or video files on a process pool.")
+    parser.add_argument("sources", nargs="+", help="Camera indexes or video file paths")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per spare core)")
+    parser.add_argument("--max-hands", type=int, default=2, help="Hands detected per frame")
+    args = parser.parse_args()
+
+    with InferencePool(args.workers, max_num_hands=args.max_hands, min_detection_confidence=0.7) as pool:
+        for source in args.sources:
+            pool.attach(int(source) if source.isdigit() else source)
+        newest = [-1] * len(pool.sources)
+        rates = [0.0] * len(pool.sources)
+        last_time = [time.monotonic()] * len(pool.sources)
+        while not all(source.finished for source in pool.sources):
+            for result in pool.poll(timeout=0.05):
+                if result.seq <= newest[result.source]:
+                    continue  # Workers finish out of order; an older result is no use any more
+                newest[result.source] = result.seq
+                frame = pool.sources[result.source].frame(result.seq)
+                if frame is None:
+                    continue
+                now = time.monotonic()
+                rates[result.source] = 0.9 * rates[result.source] + 0.1 / max(now - last_time[result.source], 1e-6)
+                last_time[result.source] = now
+                draw_hands(frame, result.points)
+                source = pool.sources[result.source]
+                cv2.putText(frame, f"{rates[result.source]:.1f} FPS | {(now - result.timestamp) * 1000:.0f} ms | dropped {source.dropped}",
+                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 100, 100), 2)
+                cv2.imshow(f"Source {result.source}: {source.source}", frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+from bisect import bisect_left
+from collections import OrderedDict
+import cv2
+import numpy as np
+from stroke_processing import draw_stroke, smooth_stroke
+from tiles import TILE_SIZE, TileStore, tiles_in_rect
+from spatial_index import SegmentGrid
+
+
+# Function to get the polyline a stroke is rasterised along (draw strokes may be smoothed)
+def stroke_path(stroke, smooth=True):
+    if stroke["type"] == "draw" and smooth:
+        return smooth_stroke(stroke["points"])
+    return np.asarray(stroke["points"], dtype=np.int32).reshape(-1, 2)
+
+
+# Function to get how far a stroke's paint reaches from its path
+def stroke_radius(stroke):
+    if stroke["type"] == "draw":
+        return stroke["thickness"] // 2 + 2  # Includes the anti-aliased edge
+    return stroke["radius"]
+
+
+# Function to get the canvas rectangle (x0, y0, x1, y1) painted by a path of the given radius
+def path_rect(path, radius):
+    (x0, y0), (x1, y1) = path.min(axis=0) - radius - 1, path.max(axis=0) + radius + 2
+    return int(x0), int(y0), int(x1), int(y1)
+
+
+# Function to paint a stroke path into the tile with the given key
+def paint_tile(tile, key, stroke, path):
+    size = tile.shape[0]
+    if stroke["type"] == "erase":
+        color, thickness = (0, 0, 0, 0), 2 * stroke["radius"]
+    else:
+        color, thickness = tuple(stroke["color"]) + (255,), stroke["thickness"]  # Fourth channel is coverage
+    draw_stroke(tile, path - (key[0] * size, key[1] * size), color, thickness, smooth=False)
+
+
+# Function to rasterise a stroke path into the tiles it touches, returns the touched tile keys
+def render_stroke(tiles, stroke, path):
+    touched = []
+    for key in tiles_in_rect(*path_rect(path, stroke_radius(stroke)), tiles.tile_size):
+        tile = tiles.get(key, create=stroke["type"] != "erase")  # Erasing empty space never allocates tiles
+        if tile is not None:
+            paint_tile(tile, key, stroke, path)
+            touched.append(key)
+    return touched
+
+
+# A drawing layer: its vector strokes, a spatial index over them and a cached tiled raster
+# that is only re-rasterised where the layer changes
+class Layer:
+    def __init__(self, name, smooth=True, max_tiles=None, spill_dir=None):
+        self.name = name
+        self.smooth = smooth
+        self.visible = True
+        self.strokes = []  # Ordered by stroke id, i.e. drawing order
+        self.index = SegmentGrid()
+        self.tiles = TileStore(max_tiles=max_tiles, spill_dir=spill_dir)
+        self._by_id = {}
+        self._paths = {}
+        self._rasterised = True
+
+    def invalidate(self):
+        self.tiles.clear()
+        self._rasterised = False
+
+    def rasterise(self):
+        if not self._rasterised:
+            for stroke in self.strokes:
+                render_stroke(self.tiles, stroke, self._paths[stroke["id"]])
+            self._rasterised = True
+
+    # Returns the cached tile (BGR plus coverage channel) or None if nothing was drawn there
+    def tile(self, key):
+        self.rasterise()
+        return self.tiles.get(key)
+
+    def _track(self, stroke):
+        path = stroke_path(stroke, self.smooth)
+        self._by_id[stroke["id"]] = stroke
+        self._paths[stroke["id"]] = path
+        self.index.insert(stroke["id"], path, stroke_radius(stroke))
+        return path
+
+    # Repaints a canvas rectangle from only the strokes the index finds there, in drawing order.
+    # Strokes are painted into a scratch copy of each tile with the usual tile offset so the
+    # result is pixel-identical to a full re-rasterisation, then only the rectangle is copied back.
+    def _rerasterise(self, rect):
+        if not self._rasterised:
+            return None
+        size = self.tiles.tile_size
+        nearby = [(i, self._paths[i]) for i in sorted(self.index.query_rect(*rect))]
+        touched = []
+        for key in tiles_in_rect(*rect, size):
+            tx, ty = key[0] * size, key[1] * size
+            x0, y0 = max(rect[0], tx) - tx, max(rect[1], ty) - ty
+            x1, y1 = min(rect[2], tx + size) - tx, min(rect[3], ty + size) - ty
+            tile = self.tiles.get(key)
+            scratch = np.zeros((size, size, 4), dtype=np.uint8) if tile is None else tile.copy()
+            scratch[y0:y1, x0:x1] = 0
+            for stroke_id, path in nearby:
+                x_min, y_min, x_max, y_max = path_rect(path, stroke_radius(self._by_id[stroke_id]))
+                if x_min < tx + size and y_min < ty + size and x_max > tx and y_max > ty:
+                    paint_tile(scratch, key, self._by_id[stroke_id], path)
+            if tile is None:
+                if not scratch[y0:y1, x0:x1].any():
+                    continue
+                tile = self.tiles.get(key, create=True)
+            tile[y0:y1, x0:x1] = scratch[y0:y1, x0:x1]
+            touched.append(key)
+        return touched
+
+    # Appending only paints the new stroke into the cached tiles, returns the touched tile keys
+    def add(self, stroke):
+        self.strokes.append(stroke)
+        path = self._track(stroke)
+        if self._rasterised:
+            return render_stroke(self.tiles, stroke, path)
+        return None
+
+    # Appends points to an erase stroke that is still in progress (erase strokes are never smoothed)
+    def extend(self, stroke, points):
+        segment = np.asarray(stroke["points"][-1:] + list(points), dtype=np.int32).reshape(-1, 2)
+        stroke["points"].extend(points)
+        self._paths[stroke["id"]] = np.vstack([self._paths[stroke["id"]], segment[1:]])
+        self.index.insert(stroke["id"], segment, stroke_radius(stroke))
+        if self._rasterised:
+            return render_stroke(self.tiles, stroke, segment)
+        return None
+
+    # Removes a stroke, returns (stroke, position in the layer, touched tile keys)
+    def remove(self, stroke_id):
+        position = bisect_left(self.strokes, stroke_id, key=lambda s: s["id"])
+        stroke = self.strokes.pop(position)
+        path = self._paths.pop(stroke_id)
+        del self._by_id[stroke_id]
+        self.index.remove(stroke_id)
+        return stroke, position, self._rerasterise(path_rect(path, stroke_radius(stroke)))
+
+    # Puts a removed stroke back at its old position, returns the touched tile keys
+    def insert(self, stroke, position):
+        self.strokes.insert(position, stroke)
+        path = self._track(stroke)
+        return self._rerasterise(path_rect(path, stroke_radius(stroke)))
+
+    # Returns the ids of draw strokes within radius of the point
+    def hit_test(self, point, radius):
+        return [i for i in self.index.hit_test(point, radius) if self._by_id[i]["type"] == "draw"]
+
+    def recolor(self, color):
+        for stroke in self.strokes:
+            if stroke["type"] == "draw":
+                stroke["color"] = color
+        self.invalidate()
+
+    def bounds(self):
+        self.rasterise()
+        return self.tiles.bounds()
+
+
+# An ordered stack of layers on an unbounded canvas, with cached composite tiles and a cached view
+class LayerStack:
+    def __init__(self, smooth=True, max_tiles=None, spill_dir=None):
+        self.smooth = smooth
+        self.max_tiles = max_tiles
+        self.spill_dir = spill_dir
+        self.layers = []
+        self._next_id = 0
+        self.journal = None  # Optional SessionJournal that records every change, see session_journal.py
+        self.clear()
+
+    def _new_layer(self, name=None):
+        return Layer(name or f"Layer {len(self.layers) + 1}", self.smooth, self.max_tiles, self.spill_dir)
+
+    def _log(self, op, *args):
+        if self.journal is not None:
+            self.journal.record(op, *args)
+
+    def clear(self):
+        for layer in self.layers:
+            layer.tiles.clear()
+        self.layers = []
+        self.layers.append(self._new_layer())
+        self.active = 0
+        self.history = []  # ("add", stroke id) or ("remove", layer index, stroke, position), oldest first
+        self._owner = {}  # Stroke id -> layer index
+        self._invalidate()
+        self._log("clear")
+
+    # Drops the cached composite for the given tile keys (or all of them) and the cached view
+    def _invalidate(self, keys=None):
+        if keys is None:
+            self._composite_tiles = OrderedDict()  # Key -> composited BGR tile, least recently used first
+        else:
+            for key in keys:
+                self._composite_tiles.pop(key, None)
+        self._view = None
+
+    @property
+    def active_layer(self):
+        return self.layers[self.active]
+
+    def add_layer(self):
+        self.layers.append(self._new_layer())
+        self.active = len(self.layers) - 1
+        self._log("add_layer")
+        return self.active_layer
+
+    def select_next_layer(self):
+        self.active = (self.active + 1) % len(self.layers)
+        self._log("select_layer", self.active)
+        return self.active_layer
+
+    def add_stroke(self, stroke, layer_index=None):
+        index = self.active if layer_index is None else layer_index
+        layer = self.layers[index]
+        stroke["id"] = self._next_id
+        self._next_id += 1
+        touched = layer.add(stroke)
+        self._owner[stroke["id"]] = index
+        self.history.append(("add", stroke["id"]))
+        if layer.visible:
+            self._invalidate(touched)
+        self._log("add", index, stroke)
+
+    # Returns the stroke with the given id, or None if it is not on the canvas
+    def find_stroke(self, stroke_id):
+        index = self._owner.get(stroke_id)
+        return None if index is None else self.layers[index]._by_id[stroke_id]
+
+    # Extends an erase stroke that is still in progress, returns False if it is no longer on the canvas
+    def extend_stroke(self, stroke, points):
+        index = self._owner.get(stroke.get("id"))
+        if index is None:
+            return False
+        layer = self.layers[index]
+        touched = layer.extend(stroke, points)
+        if layer.visible:
+            self._invalidate(touched)
+        self._log("extend", stroke["id"], points)
+        return True
+
+    def _remove(self, stroke_id):
+        index = self._owner.pop(stroke_id)
+        layer = self.layers[index]
+        stroke, position, touched = layer.remove(stroke_id)
+        if layer.visible:
+            self._invalidate(touched)
+        return index, stroke, position
+
+    # Deletes whole draw strokes on visible layers within radius of the point, returns how many were removed
+    def erase_objects(self, point, radius):
+        removed = 0
+        for layer in self.layers:
+            if not layer.visible:
+                continue
+            for stroke_id in layer.hit_test(point, radius):
+                self.remove_stroke(stroke_id)
+                removed += 1
+        return removed
+
+    # Deletes a stroke as an undoable action
+    def remove_stroke(self, stroke_id):
+        self.history.append(("remove",) + self._remove(stroke_id))
+        self._log("remove", stroke_id)
+
+    def undo(self):
+        if not self.history:
+            return None
+        action = self.history.pop()
+        if action[0] == "add":
+            stroke = self._remove(action[1])[1]
+        else:
+            _, index, stroke, position = action
+            layer = self.layers[index]
+            touched = layer.insert(stroke, position)
+            self._owner[stroke["id"]] = index
+            if layer.visible:
+                self._invalidate(touched)
+        self._log("undo")
+        return stroke
+
+    def toggle_visibility(self, index=None):
+        index = self.active if index is None else index
+        layer = self.layers[index]
+        layer.visible = not layer.visible
+        self._invalidate()
+        self._log("visibility", index)
+        return layer.visible
+
+    def recolor_layer(self, color, index=None):
+        index = self.active if index is None else index
+        layer = self.layers[index]
+        layer.recolor(color)
+        if layer.visible:
+            self._invalidate()
+        self._log("recolor", index, color)
+
+    # Returns a copy of the whole stack (layers, strokes, undo history) that later edits do not change
+    def snapshot(self):
+        def copy(stroke):
+            return dict(stroke, points=list(stroke["points"]))
+        history = [action if action[0] == "add" else action[:2] + (copy(action[2]), action[3]) for action in self.history]
+        return {"layers": [(layer.name, layer.visible, [copy(s) for s in layer.strokes]) for layer in self.layers],
+                "active": self.active, "history": history, "next_id": self._next_id}
+
+    # Replaces the whole stack with a snapshot; layers are re-rasterised lazily when first shown
+    def restore(self, state):
+        for layer in self.layers:
+            layer.tiles.clear()
+        self.layers = []
+        self._owner = {}
+        for index, (name, visible, strokes) in enumerate(state["layers"]):
+            layer = self._new_layer(name)
+            layer.visible = visible
+            layer.invalidate()
+            for stroke in strokes:
+                layer.add(stroke)
+                self._owner[stroke["id"]] = index
+            self.layers.append(layer)
+        self.active = state["active"]
+        self.history = list(state["history"])
+        self._next_id = state["next_id"]
+        self._invalidate()
+
+    # Returns the composited BGR tile for a key, or None when no visible layer has drawn there.
+    # Composites are cached in LRU order, at most max_tiles of them like each layer's TileStore;
+    # empty keys are not cached since checking the layers for them is only a lookup per layer.
+    def composite_tile(self, key):
+        composite = self._composite_tiles.get(key)
+        if composite is not None:
+            self._composite_tiles.move_to_end(key)
+            return composite
+        composite = None
+        for layer in self.layers:
+            tile = layer.tile(key) if layer.visible else None
+            if tile is not None:
+                if composite is None:
+                    composite = np.zeros(tile.shape[:2] + (3,), dtype=np.uint8)
+                np.copyto(composite, tile[:, :, :3], where=tile[:, :, 3:] > 0)
+        if composite is not None:
+            self._composite_tiles[key] = composite
+            while self.max_tiles is not None and len(self._composite_tiles) > self.max_tiles:
+                self._composite_tiles.popitem(last=False)
+        return composite
+
+    # Renders the canvas rectangle at (x0, y0) of the given size at 1:1 scale, touching only the tiles inside it
+    def render_region(self, x0, y0, width, height):
+        region = np.zeros((height, width, 3), dtype=np.uint8)
+        size = TILE_SIZE
+        for key in tiles_in_rect(x0, y0, x0 + width, y0 + height, size):
+            tile = self.composite_tile(key)
+            if tile is None:
+                continue
+            tx, ty = key[0] * size, key[1] * size
+            left, top = max(x0, tx), max(y0, ty)
+            right, bottom = min(x0 + width, tx + size), min(y0 + height, ty + size)
+            region[top - y0:bottom - y0, left - x0:right - x0] = tile[top - ty:bottom - ty, left - tx:right - tx]
+        return region
+
+    # Renders what the viewport currently shows, cached until the view or a visible tile changes
+    def render(self, viewport):
+        if self._view is not None and self._view[0] == viewport.key():
+            return self._view[1]
+        x0, y0, width, height = viewport.world_rect()
+        image = self.render_region(x0, y0, width, height)
+        if (width, height) != (viewport.width, viewport.height):
+            interpolation = cv2.INTER_AREA if viewport.zoom < 1 else cv2.INTER_LINEAR
+            image = cv2.resize(image, (viewport.width, viewport.height), interpolation=interpolation)
+        self._view = (viewport.key(), image)
+        return image
+
+    # Renders everything drawn on the visible layers at 1:1 scale
+    def render_extent(self):
+        bounds = [layer.bounds() for layer in self.layers if layer.visible]
+        bounds = [b for b in bounds if b is not None]
+        if not bounds:
+            return np.zeros((1, 1, 3), dtype=np.uint8)
+        x0, y0 = min(b[0] for b in bounds), min(b[1] for b in bounds)
+        x1, y1 = max(b[2] for b in bounds), max(b[3] for b in bounds)
+        region = self.render_region(x0, y0, x1 - x0, y1 - y0)
+        # Tiles are allocated in whole blocks, so crop to the pixels that were actually drawn
+        ys, xs = np.nonzero(np.any(region, axis=2))
+        if len(xs) == 0:
+            return np.zeros((1, 1, 3), dtype=np.uint8)
+        return region[ys.min():ys.max() + 1, xs.min():xs.max() + 1]
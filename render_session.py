@@ -0,0 +1,217 @@
+import argparse
+import math
+import os
+import cv2
+import numpy as np
+from layers import LayerStack, stroke_path
+from session_journal import JOURNAL_MAGIC, SESSION_DIR, SNAPSHOT_MAGIC, read_records, replay, snapshot_state
+
+DEFAULT_WIDTH = 1920  # Output width in pixels; the height follows the drawing's aspect ratio
+DEFAULT_FPS = 30
+MARGIN = 20  # Canvas pixels of empty border around the drawing
+
+
+# Function to load a saved session as a timeline of journal records. Strokes kept in the snapshot are
+# replayed one by one in drawing order, then a ("restore", state) step makes the stack exactly match
+# the snapshot (undo history included) before the journal tail is replayed.
+def load_timeline(directory=SESSION_DIR):
+    timeline = []
+    snapshot_path = os.path.join(directory, "snapshot.bin")
+    segment = 0
+    if os.path.exists(snapshot_path):
+        records = read_records(snapshot_path, SNAPSHOT_MAGIC)[0]
+        state, segment = snapshot_state(records)
+        timeline.extend(("add_layer", (), 0.0) for _ in state["layers"][1:])
+        strokes = [(stroke, index) for index, (_, _, layer_strokes) in enumerate(state["layers"]) for stroke in layer_strokes]
+        times = {record[1][1]["id"]: record[2] for record in records if record[0] == "stroke"}
+        for stroke, index in sorted(strokes, key=lambda item: item[0]["id"]):
+            timeline.append(("add", (index, dict(stroke)), times[stroke["id"]]))
+        timeline.append(("restore", (state,), 0.0))
+    segment_path = os.path.join(directory, f"journal-{segment:06d}.bin")
+    if os.path.exists(segment_path):
+        timeline.extend(read_records(segment_path, JOURNAL_MAGIC)[0])
+    return timeline
+
+
+# Function to get the canvas rectangle (x0, y0, x1, y1) covering every stroke in a timeline, including
+# strokes that are only in the snapshot's undo history and may be brought back by an undo
+def timeline_bounds(timeline):
+    points, reach = [], 0  # Erase strokes never add paint, so only draw strokes count
+    for op, args, _ in timeline:
+        strokes = []
+        if op == "add":
+            strokes = [args[1]]
+        elif op == "restore":
+            strokes = [s for _, _, layer_strokes in args[0]["layers"] for s in layer_strokes]
+            strokes += [action[2] for action in args[0]["history"] if action[0] == "remove"]
+        for stroke in strokes:
+            if stroke["type"] == "draw":
+                points.append(np.asarray(stroke["points"], dtype=np.int32).reshape(-1, 2))
+                reach = max(reach, stroke["thickness"])
+    if not points:
+        return 0, 0, 1, 1
+    points = np.vstack(points)
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    pad = reach // 2 + MARGIN
+    return int(x0) - pad, int(y0) - pad, int(x1) + pad + 1, int(y1) + pad + 1
+
+
+# Scales timeline records from canvas coordinates into output pixels, so strokes are rasterised
+# at the output resolution instead of being resized afterwards
+class RecordScaler:
+    def __init__(self, origin, scale):
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.scale = scale
+
+    def points(self, points):
+        pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return [tuple(p) for p in np.round((pts - self.origin) * self.scale).astype(int).tolist()]
+
+    def stroke(self, stroke):
+        scaled = dict(stroke, points=self.points(stroke["points"]))
+        key = "thickness" if stroke["type"] == "draw" else "radius"
+        scaled[key] = max(1, int(round(stroke[key] * self.scale)))
+        return scaled
+
+    def record(self, record):
+        op, args, timestamp = record
+        if op == "add":
+            args = (args[0], self.stroke(args[1]))
+        elif op == "extend":
+            args = (args[0], self.points(args[1]))
+        elif op == "restore":
+            state = args[0]
+            history = [a if a[0] == "add" else (a[0], a[1], self.stroke(a[2]), a[3]) for a in state["history"]]
+            layers = [(name, visible, [self.stroke(s) for s in strokes]) for name, visible, strokes in state["layers"]]
+            args = (dict(state, layers=layers, history=history),)
+        return op, args, timestamp
+
+
+# Function to replay a timeline into a LayerStack, yielding after every step. The stack only repaints
+# the tiles each step touches, so consecutive frames are cheap to produce.
+def play_timeline(timeline, scaler, smooth=True):
+    stack = LayerStack(smooth)
+    for record in timeline:
+        op, args, _ = scaler.record(record)
+        if op == "restore":
+            stack.restore(args[0])
+        else:
+            replay(stack, [(op, args, None)])
+        yield stack
+
+
+# Function to work out the output size and scaler for a timeline
+def output_geometry(timeline, width):
+    x0, y0, x1, y1 = timeline_bounds(timeline)
+    scale = width / (x1 - x0)
+    height = max(2, int(round((y1 - y0) * scale)) // 2 * 2)  # Video codecs want even sizes
+    return width // 2 * 2, height, RecordScaler((x0, y0), scale)
+
+
+# Function to render the final state of a session as a PNG at the given width
+def render_image(timeline, path, width=DEFAULT_WIDTH, smooth=True):
+    width, height, scaler = output_geometry(timeline, width)
+    stack = None
+    for stack in play_timeline(timeline, scaler, smooth):
+        pass
+    image = stack.render_region(0, 0, width, height) if stack else np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.imwrite(path, image)
+    return image
+
+
+# Function to render a time-lapse video of a session. With a duration, several timeline steps are
+# merged into each output frame so the whole session fits; otherwise every step gets a frame.
+def render_video(timeline, path, width=DEFAULT_WIDTH, fps=DEFAULT_FPS, duration=None, hold=2.0, smooth=True):
+    width, height, scaler = output_geometry(timeline, width)
+    steps_per_frame = max(1, math.ceil(len(timeline) / (duration * fps))) if duration else 1
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Could not open video writer for {path}")
+    frames = 0
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    try:
+        for step, stack in enumerate(play_timeline(timeline, scaler, smooth), start=1):
+            if step % steps_per_frame == 0 or step == len(timeline):
+                frame = stack.render_region(0, 0, width, height)
+                writer.write(frame)
+                frames += 1
+        for _ in range(int(hold * fps)):  # Keep the finished drawing on screen for a moment
+            writer.write(frame)
+            frames += 1
+    finally:
+        writer.release()
+    return frames
+
+
+# Function to convert a BGR tuple to an SVG colour
+def svg_color(color):
+    b, g, r = color
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+# Function to write the final state of a session as SVG. Strokes keep their smoothed paths; each erase
+# stroke becomes a mask over the strokes drawn before it on its layer, like on the canvas.
+def render_svg(timeline, path, width=DEFAULT_WIDTH, smooth=True):
+    width, height, scaler = output_geometry(timeline, width)
+    stack = None
+    for stack in play_timeline(timeline, scaler, smooth):
+        pass
+    masks, groups = [], []
+    for layer in (stack.layers if stack else []):
+        if not layer.visible:
+            continue
+        content = ""
+        for stroke in layer.strokes:
+            points = " ".join(f"{x},{y}" for x, y in stroke_path(stroke, smooth).tolist())
+            if stroke["type"] == "draw":
+                content += (f'<polyline points="{points}" stroke="{svg_color(stroke["color"])}" '
+                            f'stroke-width="{stroke["thickness"]}"/>\n')
+            else:
+                mask_id = f"erase{len(masks)}"
+                masks.append(f'<mask id="{mask_id}" maskUnits="userSpaceOnUse" x="0" y="0" width="{width}" height="{height}">'
+                             f'<rect width="{width}" height="{height}" fill="white"/>'
+                             f'<polyline points="{points}" stroke="black" stroke-width="{2 * stroke["radius"]}" fill="none" '
+                             f'stroke-linecap="round" stroke-linejoin="round"/></mask>\n')
+                content = f'<g mask="url(#{mask_id})">\n{content}</g>\n'
+        groups.append(f'<g id="{layer.name.replace(" ", "-").lower()}">\n{content}</g>\n')
+    with open(path, "w") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n')
+        f.write(f'<defs>\n{"".join(masks)}</defs>\n')
+        f.write(f'<rect width="{width}" height="{height}" fill="black"/>\n')
+        f.write('<g fill="none" stroke-linecap="round" stroke-linejoin="round">\n')
+        f.write("".join(groups))
+        f.write("</g>\n</svg>\n")
+
+
+# Renders a saved drawing session without a camera or display
+def main():
+    parser = argparse.ArgumentParser(description="Render a saved air drawing session to SVG, PNG or a time-lapse MP4.")
+    parser.add_argument("session", nargs="?", default=SESSION_DIR, help="Session folder written by the drawing app")
+    parser.add_argument("--svg", help="Write the final drawing as SVG")
+    parser.add_argument("--png", help="Write the final drawing as PNG")
+    parser.add_argument("--video", help="Write a time-lapse MP4 of the session")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="Output width in pixels")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="Time-lapse frame rate")
+    parser.add_argument("--duration", type=float, default=None, help="Time-lapse length in seconds (default: one frame per change)")
+    parser.add_argument("--no-smooth", action="store_true", help="Draw strokes along their raw points")
+    args = parser.parse_args()
+
+    timeline = load_timeline(args.session)
+    if not timeline:
+        parser.error(f"No saved session found in {args.session}")
+    if not (args.svg or args.png or args.video):
+        parser.error("Nothing to do: give --svg, --png and/or --video")
+    smooth = not args.no_smooth
+    if args.svg:
+        render_svg(timeline, args.svg, args.width, smooth)
+        print(f"Saved {args.svg}")
+    if args.png:
+        render_image(timeline, args.png, args.width, smooth)
+        print(f"Saved {args.png}")
+    if args.video:
+        frames = render_video(timeline, args.video, args.width, args.fps, args.duration, smooth=smooth)
+        print(f"Saved {args.video} ({frames} frames)")
+
+
+if __name__ == "__main__":
+    main()
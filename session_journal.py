@@ -0,0 +1,299 @@
+import glob
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+SESSION_DIR = "session"  # Folder holding the journal segments and the latest snapshot
+SNAPSHOT_EVERY = 500  # Journal records between compacted snapshots; bounds the replay on resume
+FLUSH_INTERVAL = 0.5  # Seconds the writer may hold records before flushing them to disk
+
+JOURNAL_MAGIC = b"AIRJRNL1"
+SNAPSHOT_MAGIC = b"AIRSNAP1"
+HEADER = struct.Struct("<IBId")  # CRC32 of the rest, op code, payload length, wall-clock time
+STROKE = struct.Struct("<IB3BHI")  # Id, type, colour, thickness or radius, point count
+
+# Journal operations mirror the LayerStack methods; the rest only appear in snapshots
+OPS = ["clear", "add_layer", "select_layer", "add", "extend", "remove", "undo", "visibility", "recolor",
+       "state", "layer", "stroke", "history_add", "history_remove"]
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+STROKE_TYPES = ["draw", "erase"]
+
+
+# Function to pack a stroke (id, style and int32 points)
+def encode_stroke(stroke):
+    points = np.asarray(stroke["points"], dtype=np.int32).reshape(-1, 2)
+    if stroke["type"] == "draw":
+        color, size = stroke["color"], stroke["thickness"]
+    else:
+        color, size = (0, 0, 0), stroke["radius"]
+    return STROKE.pack(stroke["id"], STROKE_TYPES.index(stroke["type"]), *color, size, len(points)) + points.tobytes()
+
+
+# Function to unpack a stroke, returns (stroke, bytes used)
+def decode_stroke(data, offset=0):
+    stroke_id, kind, b, g, r, size, count = STROKE.unpack_from(data, offset)
+    start = offset + STROKE.size
+    points = np.frombuffer(data, dtype=np.int32, count=count * 2, offset=start).reshape(-1, 2)
+    stroke = {"type": STROKE_TYPES[kind], "points": [tuple(p) for p in points.tolist()], "id": stroke_id}
+    if stroke["type"] == "draw":
+        stroke["color"], stroke["thickness"] = (b, g, r), size
+    else:
+        stroke["radius"] = size
+    return stroke, STROKE.size + count * 8
+
+
+# Function to pack one operation's arguments
+def encode_op(op, *args):
+    if op in ("clear", "add_layer", "undo"):
+        return b""
+    if op in ("select_layer", "visibility"):
+        return struct.pack("<H", args[0])
+    if op == "add":
+        return struct.pack("<H", args[0]) + encode_stroke(args[1])
+    if op == "extend":
+        return struct.pack("<I", args[0]) + np.asarray(args[1], dtype=np.int32).reshape(-1, 2).tobytes()
+    if op in ("remove", "history_add"):
+        return struct.pack("<I", args[0])
+    if op == "recolor":
+        return struct.pack("<H3B", args[0], *args[1])
+    if op == "state":
+        return struct.pack("<IHI", *args)
+    if op == "layer":
+        return struct.pack("<B", args[1]) + args[0].encode("utf-8")
+    if op == "stroke":
+        return struct.pack("<H", args[0]) + encode_stroke(args[1])
+    if op == "history_remove":
+        return struct.pack("<HI", args[0], args[2]) + encode_stroke(args[1])
+    raise ValueError(f"Unknown journal operation {op!r}")
+
+
+# Function to unpack one operation's arguments
+def decode_op(op, data):
+    if op in ("clear", "add_layer", "undo"):
+        return ()
+    if op in ("select_layer", "visibility"):
+        return struct.unpack("<H", data)
+    if op in ("add", "stroke"):
+        return struct.unpack_from("<H", data) + (decode_stroke(data, 2)[0],)
+    if op == "extend":
+        return struct.unpack_from("<I", data) + ([tuple(p) for p in np.frombuffer(data, dtype=np.int32, offset=4).reshape(-1, 2).tolist()],)
+    if op in ("remove", "history_add"):
+        return struct.unpack("<I", data)
+    if op == "recolor":
+        index, b, g, r = struct.unpack("<H3B", data)
+        return index, (b, g, r)
+    if op == "state":
+        return struct.unpack("<IHI", data)
+    if op == "layer":
+        return data[1:].decode("utf-8"), bool(data[0])
+    if op == "history_remove":
+        index, position = struct.unpack_from("<HI", data)
+        return index, decode_stroke(data, 6)[0], position
+    raise ValueError(f"Unknown journal operation {op!r}")
+
+
+# Function to frame an operation as a checksummed record
+def encode_record(op, *args, timestamp=None):
+    payload = encode_op(op, *args)
+    body = HEADER.pack(0, OP_CODES[op], len(payload), time.time() if timestamp is None else timestamp)[4:] + payload
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+# Function to read the records of a journal or snapshot file, returns ([(op, args, time)], end of the last good record).
+# Reading stops at the first torn or corrupt record, which is where a crash interrupted the writer.
+def read_records(path, magic):
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(magic):
+        return [], 0
+    records, offset = [], len(magic)
+    while offset + HEADER.size <= len(data):
+        crc, code, length, timestamp = HEADER.unpack_from(data, offset)
+        end = offset + HEADER.size + length
+        if end > len(data) or code >= len(OPS) or zlib.crc32(data[offset + 4:end]) != crc:
+            break
+        records.append((OPS[code], decode_op(OPS[code], data[offset + HEADER.size:end]), timestamp))
+        offset = end
+    return records, offset
+
+
+# Function to apply journal records to a LayerStack (with its journal detached)
+def replay(stack, records):
+    for op, args, _ in records:
+        if op == "clear":
+            stack.clear()
+        elif op == "add_layer":
+            stack.add_layer()
+        elif op == "select_layer":
+            stack.active = args[0]
+        elif op == "add":
+            index, stroke = args
+            stack._next_id = stroke.pop("id")  # Keeps ids identical to the original session
+            stack.add_stroke(stroke, index)
+        elif op == "extend":
+            stroke = stack.find_stroke(args[0])
+            if stroke is not None:
+                stack.extend_stroke(stroke, args[1])
+        elif op == "remove":
+            stack.remove_stroke(args[0])
+        elif op == "undo":
+            stack.undo()
+        elif op == "visibility":
+            stack.toggle_visibility(args[0])
+        elif op == "recolor":
+            stack.recolor_layer(args[1], args[0])
+
+
+# Function to turn snapshot records back into the state dict taken by LayerStack.restore
+def snapshot_state(records):
+    state = {"layers": [], "history": [], "active": 0, "next_id": 0}
+    segment = 0
+    for op, args, _ in records:
+        if op == "state":
+            state["next_id"], state["active"], segment = args
+        elif op == "layer":
+            state["layers"].append((args[0], args[1], []))
+        elif op == "stroke":
+            state["layers"][args[0]][2].append(args[1])
+        elif op == "history_add":
+            state["history"].append(("add", args[0]))
+        elif op == "history_remove":
+            state["history"].append(("remove",) + args)
+    return state, segment
+
+
+# Crash-safe session storage for a LayerStack. Every change is appended to a journal segment as a
+# checksummed binary record by a background writer that flushes in batches. Every SNAPSHOT_EVERY
+# records the whole stack is written to a snapshot (atomically replacing the last one) and a new
+# segment is started, so resuming loads one snapshot and replays at most SNAPSHOT_EVERY records.
+class SessionJournal:
+    def __init__(self, directory=SESSION_DIR, snapshot_every=SNAPSHOT_EVERY, flush_interval=FLUSH_INTERVAL):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.flush_interval = flush_interval
+        self.stack = None
+        self.segment = 0
+        self._since_snapshot = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"journal-{segment:06d}.bin")
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, "snapshot.bin")
+
+    # Loads the latest snapshot and replays the journal after it into the stack, then starts recording.
+    # Returns the number of strokes restored.
+    def resume(self, stack):
+        stack.journal = None
+        if os.path.exists(self.snapshot_path):
+            state, self.segment = snapshot_state(read_records(self.snapshot_path, SNAPSHOT_MAGIC)[0])
+            stack.restore(state)
+        segment_path = self._segment_path(self.segment)
+        end = None
+        if os.path.exists(segment_path):
+            records, end = read_records(segment_path, JOURNAL_MAGIC)
+            replay(stack, records)
+            self._since_snapshot = len(records)
+        self._start(stack, end)
+        return sum(len(layer.strokes) for layer in stack.layers)
+
+    # Deletes any saved session and starts recording the stack from scratch
+    def reset(self, stack):
+        self.close()
+        for path in glob.glob(os.path.join(self.directory, "journal-*.bin")) + [self.snapshot_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        self.segment = 0
+        self._since_snapshot = 0
+        self._start(stack, None)
+
+    def _start(self, stack, end):
+        self.stack = stack
+        stack.journal = self
+        # Drop a torn record left at the end of the segment by a crash
+        with open(self._segment_path(self.segment), "r+b" if end is not None else "wb") as f:
+            if end is None or end < len(JOURNAL_MAGIC):
+                f.truncate(0)
+                f.write(JOURNAL_MAGIC)
+            else:
+                f.truncate(end)
+        self._thread = threading.Thread(target=self._run, args=(self.segment,), daemon=True)
+        self._thread.start()
+
+    # Called by the LayerStack for every change
+    def record(self, op, *args):
+        self._queue.put(("record", encode_record(op, *args)))
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    # Queues a compacted snapshot of the stack; the state is copied now, encoded and written by the writer
+    def snapshot(self):
+        self._since_snapshot = 0
+        self.segment += 1
+        self._queue.put(("snapshot", (self.stack.snapshot(), self.segment)))
+
+    def _encode_snapshot(self, state, segment):
+        now = time.time()
+        parts = [SNAPSHOT_MAGIC, encode_record("state", state["next_id"], state["active"], segment, timestamp=now)]
+        for index, (name, visible, strokes) in enumerate(state["layers"]):
+            parts.append(encode_record("layer", name, visible, timestamp=now))
+            parts.extend(encode_record("stroke", index, stroke, timestamp=now) for stroke in strokes)
+        for action in state["history"]:
+            if action[0] == "add":
+                parts.append(encode_record("history_add", action[1], timestamp=now))
+            else:
+                parts.append(encode_record("history_remove", *action[1:], timestamp=now))
+        return b"".join(parts)
+
+    def _run(self, segment):
+        f = open(self._segment_path(segment), "ab")
+        last_flush = time.monotonic()
+        while True:
+            try:
+                kind, item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                kind, item = None, None
+            if kind == "record":
+                f.write(item)
+            elif kind == "snapshot":
+                state, segment = item
+                f.flush()
+                os.fsync(f.fileno())
+                # Write the new snapshot next to the old one and swap it in, so a crash leaves one intact
+                temp_path = self.snapshot_path + ".tmp"
+                with open(temp_path, "wb") as snap:
+                    snap.write(self._encode_snapshot(state, segment))
+                    snap.flush()
+                    os.fsync(snap.fileno())
+                os.replace(temp_path, self.snapshot_path)
+                f.close()
+                old_path = f.name
+                f = open(self._segment_path(segment), "wb")
+                f.write(JOURNAL_MAGIC)
+                os.remove(old_path)
+            elif kind == "stop":
+                break
+            if time.monotonic() - last_flush >= self.flush_interval or self._queue.empty():
+                f.flush()
+                last_flush = time.monotonic()
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    # Writes out everything still queued and stops the writer
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(("stop", None))
+            self._thread.join()
+            self._thread = None
+        if self.stack is not None:
+            self.stack.journal = None
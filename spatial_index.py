@@ -0,0 +1,84 @@
+from collections import defaultdict
+import numpy as np
+
+CELL_SIZE = 64  # Edge length of a grid cell in canvas pixels
+
+
+# Function to compute the distance from a point to every segment in (N, 2) start/end arrays
+def point_segment_distances(point, starts, ends):
+    p = np.asarray(point, dtype=np.float32)
+    seg = ends - starts
+    length_sq = np.einsum("ij,ij->i", seg, seg)
+    t = np.einsum("ij,ij->i", p - starts, seg) / np.where(length_sq == 0, 1, length_sq)
+    closest = starts + np.clip(t, 0, 1)[:, None] * seg
+    return np.hypot(closest[:, 0] - p[0], closest[:, 1] - p[1])
+
+
+# Uniform grid over stroke segments: each cell keeps the ids of the strokes passing through it,
+# so hit tests and region queries only look at strokes near the point instead of all of them
+class SegmentGrid:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)
+        self._strokes = {}  # Stroke id -> (segment starts, segment ends, radius, occupied cells)
+
+    def __len__(self):
+        return len(self._strokes)
+
+    def __contains__(self, stroke_id):
+        return stroke_id in self._strokes
+
+    def _cells_for(self, starts, ends, radius):
+        low = np.floor((np.minimum(starts, ends) - radius) / self.cell_size).astype(int)
+        high = np.floor((np.maximum(starts, ends) + radius) / self.cell_size).astype(int)
+        cells = set()
+        for (x0, y0), (x1, y1) in zip(low.tolist(), high.tolist()):
+            cells.update((cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1))
+        return cells
+
+    # Adds a stroke's polyline; inserting an existing id appends the new segments to it
+    def insert(self, stroke_id, points, radius):
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        starts, ends = (pts[:-1], pts[1:]) if len(pts) > 1 else (pts, pts)
+        cells = self._cells_for(starts, ends, radius)
+        if stroke_id in self._strokes:
+            old_starts, old_ends, radius, old_cells = self._strokes[stroke_id]
+            starts, ends = np.vstack([old_starts, starts]), np.vstack([old_ends, ends])
+            cells |= old_cells
+        for cell in cells:
+            self._cells[cell].add(stroke_id)
+        self._strokes[stroke_id] = (starts, ends, radius, cells)
+
+    def remove(self, stroke_id):
+        entry = self._strokes.pop(stroke_id, None)
+        if entry is None:
+            return
+        for cell in entry[3]:
+            ids = self._cells[cell]
+            ids.discard(stroke_id)
+            if not ids:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._strokes.clear()
+
+    # Returns the ids of strokes occupying any cell overlapping the rectangle [x0, x1) x [y0, y1)
+    def query_rect(self, x0, y0, x1, y1):
+        cx0, cy0 = int(x0) // self.cell_size, int(y0) // self.cell_size
+        cx1, cy1 = (int(x1) - 1) // self.cell_size, (int(y1) - 1) // self.cell_size
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                found |= self._cells.get((cx, cy), set())
+        return found
+
+    # Returns the ids of strokes whose painted area comes within radius of the point
+    def hit_test(self, point, radius):
+        x, y = point
+        hits = []
+        for stroke_id in self.query_rect(x - radius, y - radius, x + radius + 1, y + radius + 1):
+            starts, ends, stroke_radius, _ = self._strokes[stroke_id]
+            if point_segment_distances(point, starts, ends).min() <= radius + stroke_radius:
+                hits.append(stroke_id)
+        return hits
@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+# Default tolerance (in pixels) used when simplifying strokes
+DEFAULT_TOLERANCE = 1.5
+# Number of interpolated points generated between two stroke points when smoothing
+SAMPLES_PER_SEGMENT = 6
+
+
+# Function to drop consecutive duplicate points (finger held still between frames)
+def remove_duplicates(points):
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if len(pts) < 2:
+        return pts
+    keep = np.ones(len(pts), dtype=bool)
+    keep[1:] = np.any(pts[1:] != pts[:-1], axis=1)
+    return pts[keep]
+
+
+# Function to compute the distance of every point between start and end to the segment start-end
+def _segment_distances(pts, start, end):
+    seg = pts[end] - pts[start]
+    rel = pts[start + 1:end] - pts[start]
+    length = np.hypot(seg[0], seg[1])
+    if length == 0:
+        return np.hypot(rel[:, 0], rel[:, 1])
+    return np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+
+
+# Function to simplify a stroke with the Ramer-Douglas-Peucker algorithm
+def simplify_stroke(points, tolerance=DEFAULT_TOLERANCE):
+    pts = remove_duplicates(points)
+    if len(pts) < 3 or tolerance <= 0:
+        return [tuple(p) for p in np.round(pts).astype(int).tolist()]
+
+    keep = np.zeros(len(pts), dtype=bool)
+    keep[0] = keep[-1] = True
+    # Iterative instead of recursive so long strokes never hit the recursion limit
+    stack = [(0, len(pts) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        distances = _segment_distances(pts, start, end)
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return [tuple(p) for p in np.round(pts[keep]).astype(int).tolist()]
+
+
+# Function to resample a stroke along a Catmull-Rom spline for smooth rendering
+def smooth_stroke(points, samples_per_segment=SAMPLES_PER_SEGMENT):
+    pts = remove_duplicates(points)
+    if len(pts) < 3 or samples_per_segment < 2:
+        return np.round(pts).astype(np.int32)
+
+    # Repeat the end points so the curve passes through the first and last point
+    padded = np.vstack([pts[:1], pts, pts[-1:]])
+    p0, p1, p2, p3 = padded[:-3], padded[1:-2], padded[2:-1], padded[3:]
+    t = np.linspace(0, 1, samples_per_segment, endpoint=False, dtype=np.float32)[:, None, None]
+    t2 = t * t
+    t3 = t2 * t
+    curve = 0.5 * (2 * p1
+                   + (p2 - p0) * t
+                   + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2
+                   + (3 * p1 - p0 - 3 * p2 + p3) * t3)
+    curve = curve.transpose(1, 0, 2).reshape(-1, 2)
+    curve = np.vstack([curve, pts[-1:]])
+    return remove_duplicates(np.round(curve)).astype(np.int32)
+
+
+# Function to draw a stroke onto an image in a single polyline call
+def draw_stroke(img, points, color, thickness, smooth=True):
+    if len(points) == 0:
+        return
+    pts = smooth_stroke(points) if smooth else np.asarray(points, dtype=np.int32).reshape(-1, 2)
+    if len(pts) == 1:
+        cv2.circle(img, (int(pts[0][0]), int(pts[0][1])), max(1, thickness // 2), color, -1)
+        return
+    cv2.polylines(img, [pts.reshape(-1, 1, 2)], False, color, thickness, cv2.LINE_AA)
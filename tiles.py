@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+import numpy as np
+
+TILE_SIZE = 256  # Edge length of a tile in canvas pixels
+MIN_ZOOM = 0.25
+MAX_ZOOM = 4.0
+
+
+# Function to list the keys of the tiles covering the canvas rectangle [x0, x1) x [y0, y1)
+def tiles_in_rect(x0, y0, x1, y1, tile_size=TILE_SIZE):
+    tx0, ty0 = int(x0) // tile_size, int(y0) // tile_size
+    tx1, ty1 = (int(x1) - 1) // tile_size, (int(y1) - 1) // tile_size
+    return [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+
+
+# Sparse store of fixed-size tiles, allocated on first write and kept in LRU order.
+# When a spill directory is given, tiles beyond max_tiles are written to disk and loaded back on access.
+class TileStore:
+    def __init__(self, tile_size=TILE_SIZE, channels=4, max_tiles=None, spill_dir=None):
+        self.tile_size = tile_size
+        self.channels = channels
+        self.max_tiles = max_tiles
+        self.spill_dir = spill_dir
+        self._tiles = OrderedDict()
+        self._spilled = set()
+        self._spill_path = None
+
+    def __len__(self):
+        return len(self._tiles) + len(self._spilled)
+
+    def __contains__(self, key):
+        return key in self._tiles or key in self._spilled
+
+    def keys(self):
+        return list(self._tiles) + list(self._spilled)
+
+    def get(self, key, create=False):
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            return tile
+        if key in self._spilled:
+            path = self._tile_path(key)
+            tile = np.load(path)
+            os.remove(path)
+            self._spilled.discard(key)
+        elif create:
+            tile = np.zeros((self.tile_size, self.tile_size, self.channels), dtype=np.uint8)
+        else:
+            return None
+        self._tiles[key] = tile
+        self._evict()
+        return tile
+
+    def discard(self, key):
+        if self._tiles.pop(key, None) is None and key in self._spilled:
+            self._spilled.discard(key)
+            os.remove(self._tile_path(key))
+
+    # Returns the canvas rectangle (x0, y0, x1, y1) covered by allocated tiles, or None when empty
+    def bounds(self):
+        keys = self.keys()
+        if not keys:
+            return None
+        tx, ty = np.array(keys).T
+        return (int(tx.min()) * self.tile_size, int(ty.min()) * self.tile_size,
+                (int(tx.max()) + 1) * self.tile_size, (int(ty.max()) + 1) * self.tile_size)
+
+    def clear(self):
+        self._tiles.clear()
+        self._spilled.clear()
+        if self._spill_path is not None:
+            shutil.rmtree(self._spill_path, ignore_errors=True)
+            self._spill_path = None
+
+    def _tile_path(self, key):
+        return os.path.join(self._spill_path, f"{key[0]}_{key[1]}.npy")
+
+    def _evict(self):
+        if self.max_tiles is None or self.spill_dir is None:
+            return
+        while len(self._tiles) > self.max_tiles:
+            if self._spill_path is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_path = tempfile.mkdtemp(prefix="tiles_", dir=self.spill_dir)
+            key, tile = self._tiles.popitem(last=False)
+            np.save(self._tile_path(key), tile)
+            self._spilled.add(key)
+
+
+# Maps between screen pixels and canvas coordinates for panning and zooming
+class Viewport:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        self.x = 0  # Canvas coordinate shown at the top-left corner of the screen
+        self.y = 0
+        self.zoom = 1.0
+
+    def key(self):
+        return (self.x, self.y, self.zoom, self.width, self.height)
+
+    def screen_to_world(self, point):
+        return (int(round(self.x + point[0] / self.zoom)), int(round(self.y + point[1] / self.zoom)))
+
+    # Vectorised version for an (N, 2) array of canvas points
+    def world_to_screen(self, points):
+        pts = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        return np.round((pts - (self.x, self.y)) * self.zoom).astype(np.int32)
+
+    # Returns the canvas rectangle (x0, y0, width, height) visible on screen
+    def world_rect(self):
+        return (self.x, self.y, max(1, int(round(self.width / self.zoom))), max(1, int(round(self.height / self.zoom))))
+
+    def pan(self, dx, dy):
+        self.x -= int(round(dx / self.zoom))
+        self.y -= int(round(dy / self.zoom))
+
+    # Zooms by the given factor while keeping the canvas point under the anchor fixed on screen
+    def zoom_at(self, factor, anchor):
+        world_x, world_y = self.x + anchor[0] / self.zoom, self.y + anchor[1] / self.zoom
+        self.zoom = float(np.clip(self.zoom * factor, MIN_ZOOM, MAX_ZOOM))
+        self.x = int(round(world_x - anchor[0] / self.zoom))
+        self.y = int(round(world_y - anchor[1] / self.zoom))
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+
+
+# A countdown measured on the monotonic clock, so its length does not depend on the frame rate
+class Countdown:
+    def __init__(self, duration):
+        self.duration = duration
+        self._end = None
+
+    @property
+    def running(self):
+        return self._end is not None
+
+    def start(self, now=None):
+        self._end = (time.monotonic() if now is None else now) + self.duration
+
+    def stop(self):
+        self._end = None
+
+    def remaining(self, now=None):
+        if self._end is None:
+            return 0.0
+        return max(0.0, self._end - (time.monotonic() if now is None else now))
+
+    def expired(self, now=None):
+        return self._end is not None and self.remaining(now) == 0.0
+
+
+# Accepts a gesture only once it has dominated the recent past: recent (timestamp, gesture) records are
+# kept in a ring buffer, and a gesture is confirmed when it makes up at least min_ratio of the records
+# in the last window seconds and was first seen in that window at least dwell seconds ago.
+# Being time-based, the same hold time confirms a gesture at 10 FPS and at 60 FPS.
+class GestureFilter:
+    def __init__(self, window=0.6, dwell=0.4, min_ratio=0.7, capacity=128):
+        self.window = window
+        self.dwell = dwell
+        self.min_ratio = min_ratio
+        self._times = np.full(capacity, -np.inf)
+        self._codes = np.full(capacity, -1, dtype=np.int32)
+        self._next = 0
+        self._labels = []  # Gesture values by code; code -1 means no gesture
+
+    def _code(self, gesture):
+        if gesture is None:
+            return -1
+        if gesture not in self._labels:
+            self._labels.append(gesture)
+        return self._labels.index(gesture)
+
+    def push(self, gesture, now=None):
+        self._times[self._next] = time.monotonic() if now is None else now
+        self._codes[self._next] = self._code(gesture)
+        self._next = (self._next + 1) % len(self._times)
+
+    def reset(self):
+        self._times[:] = -np.inf
+        self._codes[:] = -1
+
+    # Returns the most common gesture in the window and its share of the records
+    def majority(self, now=None):
+        now = time.monotonic() if now is None else now
+        recent = self._codes[self._times >= now - self.window]
+        if len(recent) == 0:
+            return None, 0.0
+        counts = np.bincount(recent + 1)  # Shifted so "no gesture" lands in bin 0
+        best = int(np.argmax(counts))
+        if best == 0:
+            return None, counts[0] / len(recent)
+        return self._labels[best - 1], counts[best] / len(recent)
+
+    # Returns the confirmed gesture, or None while no gesture has been held long enough
+    def confirmed(self, now=None):
+        now = time.monotonic() if now is None else now
+        gesture, ratio = self.majority(now)
+        if gesture is None or ratio < self.min_ratio:
+            return None
+        in_window = (self._times >= now - self.window) & (self._codes == self._labels.index(gesture))
+        if now - self._times[in_window].min() < self.dwell:
+            return None
+        return gesture